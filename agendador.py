@@ -0,0 +1,186 @@
+"""
+FRACTALV - Agendador da Rotina das 22h10
+Roda numa thread ao lado do app. Depois do horário de corte (22h10, quando saem os resultados
+oficiais) consulta as fontes a cada `intervalo` segundos, com leitura incremental, e detecta
+concursos novos pela impressão da base. Só os jogos afetados voltam ao backtest (pelo
+ArmazemDobras, que calcula só as dobras novas) e ao ranking; o resultado é publicado de uma vez
+no CACHE_JOGOS e a interface o pega no próximo rerun, sem que nenhum operador espere pelo cálculo.
+Relógio e fonte são injetáveis: RelogioSimulado + FonteLocal testam a rotina sem esperar 22h10.
+"""
+import threading
+from datetime import datetime, timedelta, time as horario
+from links_planilhas import LINKS_CSV, FORMATOS_JOGOS, JOGOS_LISTA
+from motor_matematico import MotorInferencia, OtimizadorFinanceiro
+from ingestao import IngestorDados
+from armazem_dobras import ArmazemDobras
+from cache_compartilhado import CACHE_JOGOS, versao_dados
+from pipeline_noturno import PROFUNDIDADE, analisar_jogo
+from varredura import carregar_versoes, parametros_estaveis
+from instrumentacao import INSTRUMENTACAO
+
+HORARIO_CORTE = horario(22, 10)
+JANELA = timedelta(hours=3)
+INTERVALO = 300
+# Na interface a linha de base usa menos simulações que a rotina noturna (p-valor até ~1e-4)
+SIMULACOES_INTERFACE = 10000
+
+# --- CÁLCULO E PUBLICAÇÃO (compartilhado com o botão ATUALIZAR do app) ---
+def processar_jogo(jogo, matriz, dobras=None, salvo=None, versoes=None):
+    """Dados que o app exibe: (matriz, cols, vencedor, score, placar, freq, fractal, significancia)."""
+    parametros = parametros_estaveis(jogo, versoes)
+    vencedor, score_total, placar_dict, freq, fractal, significancia = analisar_jogo(matriz, dobras, PROFUNDIDADE, SIMULACOES_INTERFACE, salvo, parametros)
+    return (matriz, matriz.cols, vencedor, score_total, placar_dict, freq, fractal, significancia)
+
+def montar_otimizador(tabela):
+    """Otimizador já indexado, montado uma vez por tabela e compartilhado por todas as sessões."""
+    otimizador = OtimizadorFinanceiro(LINKS_CSV.get("VALORES"))
+    if tabela is not None: otimizador.carregar_dados(tabela)
+    return {'tabela_valores': tabela, 'otimizador': otimizador}
+
+def aquecer_ranking(jogo, dados, parametros):
+    """Ajusta o modelo vencedor na aposta mínima (CACHE_RANKING), para a Mesa abrir sem esperar."""
+    matriz, vencedor = dados[0], dados[2]
+    MotorInferencia.gerar_bilhetes(vencedor, matriz, matriz.cols, FORMATOS_JOGOS.get(jogo, {}).get("aposta_min", matriz.k), 1, parametros=parametros)
+
+def _ultimo_concurso(matriz):
+    return int(matriz.concursos[0]) if matriz.concursos is not None and len(matriz.concursos) else "?"
+
+def atualizar_cache(jogos, ingestor, armazem, cache=CACHE_JOGOS, workers=None, progresso=None, log=None):
+    """
+    Ingestão incremental de todos os jogos; backtest, significância e ranking só dos que mudaram
+    (sorteio novo ou versão do motor promovida); publicação atômica. Uma atualização por vez no
+    processo: quem chegar durante outra espera e encontra tudo na versão atual. Devolve os jogos publicados.
+    """
+    with cache.atualizacao:
+        if progresso: progresso(0, "Baixando todas as bases em paralelo...")
+        bases = ingestor.carregar_todos(jogos)
+        versoes = carregar_versoes()
+        parametros = {jogo: parametros_estaveis(jogo, versoes) for jogo in jogos}
+        versao = {jogo: versao_dados(bases[jogo], parametros[jogo]) for jogo in jogos if bases.get(jogo) is not None}
+        matrizes = {jogo: bases[jogo] for jogo in versao if not cache.atual(jogo, versao[jogo])}
+        if log and matrizes: log("Novidades: " + ", ".join(f"{j} ({_ultimo_concurso(m)})" for j, m in matrizes.items()))
+        def avisar(feitas, total, jogo):
+            if progresso: progresso(int((feitas / total) * 95), f"Backtest paralelo: {jogo} ({feitas}/{total} tarefas)...")
+        try: dobras = armazem.completar(matrizes, PROFUNDIDADE, workers=workers, progresso=avisar, parametros=parametros) if matrizes else {}
+        except Exception as e:
+            INSTRUMENTACAO.excecao("backtest.paralelo", e)
+            dobras = {}
+        if progresso: progresso(95, "Comparando com o jogo aleatório...")
+        novos = {}
+        for jogo, matriz in matrizes.items():
+            try:
+                dados = processar_jogo(jogo, matriz, dobras.get(jogo), versoes=versoes)
+                aquecer_ranking(jogo, dados, parametros[jogo])
+                novos[jogo] = (versao[jogo], dados)
+            except Exception as e: INSTRUMENTACAO.excecao(f"processar.{jogo}", e)
+        # A tabela de preços só é trocada se veio diferente; falha no download mantém a anterior
+        tabela = bases.get("VALORES")
+        precos = tabela is not None and not tabela.equals(cache.ler('tabela_valores'))
+        # Sem novidade não publica: a geração do cache não muda e as sessões abertas não são refeitas
+        if novos or precos or cache.ler('otimizador') is None:
+            cache.publicar(novos, {'versoes': versoes, **(montar_otimizador(tabela) if precos or cache.ler('otimizador') is None else {})})
+        if progresso: progresso(100, "Sistema Pronto!")
+        return list(novos)
+
+# --- RELÓGIOS ---
+class RelogioSistema:
+    def agora(self): return datetime.now()
+
+    def dormir(self, segundos, evento):
+        """Espera o tempo pedido ou até o evento (acordar/parar), o que vier primeiro."""
+        evento.wait(max(0.0, segundos))
+
+class RelogioSimulado:
+    """Relógio de teste: dormir avança o tempo na hora, então um dia inteiro roda em milissegundos."""
+    def __init__(self, inicio):
+        self.atual = inicio
+
+    def agora(self): return self.atual
+
+    def dormir(self, segundos, evento):
+        self.atual += timedelta(seconds=max(0.0, segundos))
+
+# --- AGENDADOR ---
+class AgendadorRotina:
+    """
+    Entre o corte e corte + janela, consulta a cada `intervalo`; fora dela, dorme até o próximo
+    corte. acordar() pede uma verificação imediata (ex.: o app abriu com o cache vazio).
+    """
+    def __init__(self, jogos=None, ingestor=None, armazem=None, cache=CACHE_JOGOS, relogio=None,
+                 corte=HORARIO_CORTE, janela=JANELA, intervalo=INTERVALO, workers=None, log=None):
+        self.jogos = list(jogos or JOGOS_LISTA)
+        self.ingestor = ingestor or IngestorDados()
+        self.armazem = armazem or ArmazemDobras()
+        self.cache = cache
+        self.relogio = relogio or RelogioSistema()
+        self.corte, self.janela, self.intervalo = corte, janela, intervalo
+        self.workers = workers
+        self.log = log
+        self._parar, self._acordar = threading.Event(), threading.Event()
+        self._thread = None
+        self.estado = {"ocupado": False, "etapa": "", "ultima_verificacao": None, "ultima_publicacao": None, "publicados": []}
+
+    def proximo_corte(self, agora):
+        corte = datetime.combine(agora.date(), self.corte)
+        return corte if agora < corte else corte + timedelta(days=1)
+
+    def na_janela(self, agora):
+        """Dentro de [corte, corte + janela), inclusive depois da meia-noite."""
+        for dia in (agora.date(), agora.date() - timedelta(days=1)):
+            corte = datetime.combine(dia, self.corte)
+            if corte <= agora < corte + self.janela: return True
+        return False
+
+    def verificar(self):
+        """Uma rodada: detecta concursos novos e publica os jogos afetados. Devolve a lista publicada."""
+        def progresso(_, etapa): self.estado["etapa"] = etapa
+        self.estado["ocupado"] = True
+        try:
+            with INSTRUMENTACAO.span("agendador.verificacao"):
+                publicados = atualizar_cache(self.jogos, self.ingestor, self.armazem, self.cache, self.workers, progresso, self.log)
+        except Exception as e:
+            INSTRUMENTACAO.excecao("agendador", e)
+            publicados = []
+        finally:
+            self.estado["ocupado"] = False
+        agora = self.relogio.agora()
+        self.estado["ultima_verificacao"] = agora
+        if publicados: self.estado.update(ultima_publicacao=agora, publicados=publicados)
+        return publicados
+
+    def passo(self):
+        """Verifica se estiver na janela (ou se foi acordado) e devolve quantos segundos dormir."""
+        agora = self.relogio.agora()
+        if self._acordar.is_set() or self.na_janela(agora):
+            self._acordar.clear()
+            self.verificar()
+            agora = self.relogio.agora()
+            if self.na_janela(agora): return self.intervalo
+        return (self.proximo_corte(agora) - agora).total_seconds()
+
+    def executar(self, ate=None):
+        """Laço do agendador; ate (datetime) encerra quando o relógio passar dele (testes com RelogioSimulado)."""
+        while not self._parar.is_set() and (ate is None or self.relogio.agora() < ate):
+            espera = self.passo()
+            if ate is not None: espera = min(espera, max(0.0, (ate - self.relogio.agora()).total_seconds()))
+            # acordar() e parar() interrompem a espera (parar também dispara o evento de acordar)
+            self.relogio.dormir(espera, self._acordar)
+
+    # --- THREAD ---
+    def iniciar(self, verificar_agora=False):
+        if self._thread is None or not self._thread.is_alive():
+            # Um parar() anterior deixou o evento de acordar disparado
+            self._parar.clear()
+            self._acordar.clear()
+            self._thread = threading.Thread(target=self.executar, name="fractalv-agendador", daemon=True)
+            self._thread.start()
+        if verificar_agora: self._acordar.set()
+        return self
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self, espera=None):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None: self._thread.join(espera)
@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import time
-from io import BytesIO
-from motor_matematico import OtimizadorFinanceiro, MotorInferencia
-from links_planilhas import LINKS_CSV
+from motor_matematico import OtimizadorFinanceiro, MotorInferencia, estatisticas_bilhetes, empilhar_bilhetes
+from exportacao import exportar, parquet_disponivel, FORMATOS
+from links_planilhas import LINKS_CSV, JOGOS_LISTA
+from ingestao import IngestorDados
+from armazem_dobras import ArmazemDobras, versao_motor
+from instrumentacao import INSTRUMENTACAO, Instrumentacao
+from pipeline_noturno import carregar_resumo, ler_valores, PROFUNDIDADE
+from varredura import carregar_versoes, parametros_estaveis
+from cache_compartilhado import CACHE_JOGOS, versao_dados
+from agendador import AgendadorRotina, atualizar_cache, processar_jogo, montar_otimizador
 
 # --- 1. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="FRACTALV | Auto-Pilot", layout="wide", page_icon="🧩")
@@ -26,65 +32,126 @@ st.markdown("""
     .stProgress > div > div > div > div { background-color: #a855f7; }
     div[data-testid="stTable"] { font-size: 14px; }
     .financial-box { border: 1px solid #333; background: #1a1a1a; padding: 15px; border-radius: 10px; margin-top: 10px; }
+    .ticket-row { padding: 6px 0; border-bottom: 1px solid #222; }
+    .group-title { color: #ccc; margin: 10px 0 4px 0; }
+    .eq-bar { display: inline-block; width: 80px; height: 8px; background: #1f2937; border-radius: 4px; vertical-align: middle; margin-left: 4px; }
+    .eq-fill { height: 100%; background: #a855f7; border-radius: 4px; }
 </style>
 """, unsafe_allow_html=True)
 
-# Lista Global e Constantes
-JOGOS_LISTA = ["MEGA_SENA", "LOTOFACIL", "QUINA", "LOTOMANIA", "TIMEMANIA", "DIA_DE_SORTE", "DUPLA_SENA"]
-PRIMOS = set([2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97])
-FIBONACCI = set([1, 2, 3, 5, 8, 13, 21, 34, 55, 89])
+# Constantes
+BILHETES_POR_PAGINA = 25
+JANELA_CURVA = 50
+
+# Instrumentação por sessão: o que esta aba mede vai para o registro dela (o painel Performance
+# liga, mostra e zera só esse); o agendador segue no registro do processo
+perf_sessao = INSTRUMENTACAO.usar(st.session_state.setdefault('perf', Instrumentacao(INSTRUMENTACAO.ativo)))
 
 # --- 3. FUNÇÕES DE PROCESSAMENTO ---
-def processar_jogo_individual(jogo_key):
-    link = LINKS_CSV.get(jogo_key)
+@st.cache_resource
+def obter_ingestor():
+    return IngestorDados()
+
+@st.cache_resource
+def obter_armazem():
+    return ArmazemDobras()
+
+def processar_jogo_individual(jogo_key, matriz=None, dobras=None, salvo=None, versoes=None):
     try:
-        df = pd.read_csv(link, decimal=",", thousands=".", on_bad_lines='skip')
-        cols = [c for c in df.columns if c.startswith('D') and '2º' not in c]
-        if not cols: return None
-        for c in cols: df[c] = pd.to_numeric(df[c], errors='coerce')
-        todas = df.head(50)[cols].values.flatten()
-        todas = todas[~np.isnan(todas)]
-        freq = pd.Series(todas).value_counts().sort_values(ascending=False)
-        vencedor, score_total, placar_dict = MotorInferencia.executar_backtest_profundo(df, cols, profundidade=12)
-        return (df, cols, vencedor, score_total, placar_dict, freq)
-    except Exception as e: return None
+        if matriz is None: matriz = obter_ingestor().carregar(jogo_key)
+        if matriz is None: return None
+        return processar_jogo(jogo_key, matriz, dobras, salvo, versoes or CACHE_JOGOS.ler('versoes'))
+    except Exception as e:
+        INSTRUMENTACAO.excecao(f"processar.{jogo_key}", e)
+        return None
+
+@st.cache_resource
+def obter_agendador():
+    """Um agendador por processo: verifica as fontes depois das 22h10 e publica no cache compartilhado."""
+    return AgendadorRotina(JOGOS_LISTA, obter_ingestor(), obter_armazem()).iniciar()
+
+def atualizar_jogo(jogo):
+    """Atualização de um jogo só: sem sorteio novo (mesma versão), reaproveita o que já está no cache compartilhado."""
+    atualizar_cache([jogo], obter_ingestor(), obter_armazem())
 
 def executar_atualizacao_geral():
+    """
+    Mesmo caminho do agendador (agendador.atualizar_cache): uma atualização por vez no processo,
+    e só os jogos com sorteio novo (ou versão nova) voltam ao backtest.
+    """
+    perf_sessao.reiniciar()
     progresso = st.progress(0, text="Iniciando sistema FractalV...")
-    total = len(JOGOS_LISTA)
-    for i, jogo in enumerate(JOGOS_LISTA):
-        progresso.progress(int((i / total) * 100), text=f"Baixando e Analisando: {jogo}...")
-        dados = processar_jogo_individual(jogo)
-        st.session_state[f'dados_{jogo}'] = dados
-        if f'res_{jogo}' in st.session_state: del st.session_state[f'res_{jogo}']
-    progresso.progress(100, text="Sistema Pronto!")
+    atualizar_cache(JOGOS_LISTA, obter_ingestor(), obter_armazem(), progresso=lambda pct, texto: progresso.progress(pct, text=texto))
     time.sleep(1)
     progresso.empty()
 
-def calcular_stats_completas(p):
-    pares = len([x for x in p if x % 2 == 0])
-    impares = len(p) - pares
-    soma = int(sum(p))
-    qtd_primos = len([x for x in p if x in PRIMOS])
-    qtd_fibo = len([x for x in p if x in FIBONACCI])
-    return f"""<div class='stat-container'><span class='stat-tag'>Pares: {pares}</span><span class='stat-tag'>Ímpares: {impares}</span><span class='stat-tag'>Σ: {soma}</span><span class='stat-tag stat-highlight'>Primos: {qtd_primos}</span><span class='stat-tag stat-highlight'>Fibo: {qtd_fibo}</span></div>"""
+def carregar_resultados_noturnos():
+    """Abre com o que a rotina noturna já calculou. Só aceita se todos os jogos estiverem no cache local com a mesma impressão."""
+    resumo = carregar_resumo()
+    if not resumo: return False
+    versoes = carregar_versoes()
+    ingestor, carregados = obter_ingestor(), {}
+    for jogo in JOGOS_LISTA:
+        salvo = resumo.get("jogos", {}).get(jogo)
+        matriz = ingestor.carregar_local(jogo) if salvo else None
+        if matriz is None or matriz.impressao != salvo["impressao"]: return False
+        # Uma versão promovida depois da rotina invalida o placar salvo
+        estavel = (versoes.get("jogos", {}).get(jogo) or {}).get("estavel") or {}
+        if salvo.get("versao", 0) != estavel.get("versao", 0): return False
+        carregados[jogo] = (versao_dados(matriz, parametros_estaveis(jogo, versoes)), processar_jogo_individual(jogo, matriz, salvo=salvo, versoes=versoes))
+    # Jogo que falhou ao processar fica fora do cache (publicar descarta dados None) e volta como
+    # pendente: devolver False faz a abertura acordar o agendador para recalculá-lo
+    CACHE_JOGOS.publicar(carregados, {'versoes': versoes, **montar_otimizador(ler_valores())})
+    return all(dados is not None for _, dados in carregados.values())
 
-def calcular_score_visual(p, total_dezenas):
-    if len(p) == 0: return 0
-    pares = len([x for x in p if x % 2 == 0])
-    ratio = pares / len(p)
-    diff = abs(ratio - 0.5) 
-    score = max(0, 1.0 - (diff * 2))
-    return score
+@st.cache_data(max_entries=64, show_spinner=False)
+def curva_acertos(jogo, versao, geracao):
+    """Média móvel de acertos por modelo em todas as dobras já gravadas (sem recalcular). versao/geracao só invalidam o cache."""
+    dados = CACHE_JOGOS.obter(jogo)
+    if dados is None: return pd.DataFrame()
+    parametros, armazem = parametros_estaveis(jogo, CACHE_JOGOS.ler('versoes')), obter_armazem()
+    # As dobras da interface (IA a cada dobra) completam as da história inteira (pipeline --profundidade 0)
+    historico = armazem.historico(dados[0], versao_motor(parametros, MotorInferencia.intervalo_ia_padrao(PROFUNDIDADE)))
+    profundo = armazem.historico(dados[0], versao_motor(parametros, MotorInferencia.intervalo_ia_padrao(None)))
+    if len(profundo): historico = historico.combine_first(profundo) if len(historico) else profundo
+    if len(historico) < 2: return historico
+    return historico.rolling(JANELA_CURVA, min_periods=min(JANELA_CURVA, len(historico))).mean().dropna()
 
-def to_csv(lista_jogos):
-    output = BytesIO()
-    df = pd.DataFrame(lista_jogos)
-    df_clean = df.drop(columns=['Dezenas'])
-    df_clean['Dezenas'] = [", ".join([str(int(n)) for n in x['Dezenas']]) for x in lista_jogos]
-    df_clean['Stats'] = [f"P:{len([n for n in x['Dezenas'] if n%2==0])} S:{sum(x['Dezenas'])}" for x in lista_jogos]
-    df_clean.to_csv(output, index=False, sep=';')
-    return output.getvalue()
+def montar_mesa(jogo, vencedor, matriz, carrinho, fixos, excluidos, cobertura=False):
+    """Gera o carrinho inteiro uma vez por combinação de estratégia/filtros/dados; os reruns reaproveitam."""
+    parametros = parametros_estaveis(jogo, CACHE_JOGOS.ler('versoes'))
+    chave = repr((vencedor, matriz.impressao, [(int(x['qtd_volantes']), int(x['dezenas'])) for x in carrinho], sorted(fixos), sorted(excluidos), sorted(parametros.items()), cobertura))
+    mesa = st.session_state.get(f'mesa_{jogo}')
+    if mesa is not None and mesa['chave'] == chave: return mesa
+    blocos, grupos, metricas, idx_global = [], [], [], 0
+    for item in carrinho:
+        q_v, q_d = int(item['qtd_volantes']), int(item['dezenas'])
+        if cobertura:
+            bloco, metrica = MotorInferencia.gerar_cobertura(vencedor, matriz, matriz.cols, q_d, q_v, fixos, excluidos, seed_inicial=idx_global + 1, parametros=parametros)
+            if metrica: metricas.append(metrica)
+        else: bloco = MotorInferencia.gerar_bilhetes(vencedor, matriz, matriz.cols, q_d, q_v, fixos, excluidos, seed_inicial=idx_global + 1, parametros=parametros)
+        blocos.append(bloco)
+        grupos.append((idx_global, q_v, q_d))
+        idx_global += q_v
+    bilhetes = empilhar_bilhetes(blocos)
+    mesa = {'chave': chave, 'bilhetes': bilhetes, 'stats': estatisticas_bilhetes(bilhetes) if len(bilhetes) else {}, 'grupos': grupos, 'fixos': set(fixos), 'cobertura': metricas}
+    st.session_state[f'mesa_{jogo}'] = mesa
+    return mesa
+
+def renderizar_pagina(mesa, inicio, fim):
+    """Um único bloco HTML para as linhas [inicio, fim) da mesa."""
+    stats, partes = mesa['stats'], []
+    titulos = {g[0]: g for g in mesa['grupos']}
+    for i in range(inicio, fim):
+        if i in titulos: partes.append(f"<div class='group-title'>👉 <b>{titulos[i][1]}x</b> Jogos de <b>{titulos[i][2]}</b> dezenas:</div>")
+        bolas = "".join(f"<div class='loto-ball {'ball-fixed' if n in mesa['fixos'] else 'ball-normal'}'>{n:02d}</div>" for n in mesa['bilhetes'][i].tolist() if n >= 0)
+        partes.append(
+            f"<div class='ticket-row'><span class='game-index'>#{i + 1:02d}</span>{bolas}<div class='stat-container'>"
+            f"<span class='stat-tag'>Pares: {stats['pares'][i]}</span><span class='stat-tag'>Ímpares: {stats['impares'][i]}</span>"
+            f"<span class='stat-tag'>Σ: {stats['soma'][i]}</span><span class='stat-tag stat-highlight'>Primos: {stats['primos'][i]}</span>"
+            f"<span class='stat-tag stat-highlight'>Fibo: {stats['fibonacci'][i]}</span>"
+            f"<div class='stat-tag'>Equilíbrio<div class='eq-bar'><div class='eq-fill' style='width:{stats['equilibrio'][i] * 100:.0f}%'></div></div></div></div></div>")
+    return "".join(partes)
 
 # --- 4. SIDEBAR (GUIA DO OPERADOR ATUALIZADO) ---
 with st.sidebar:
@@ -94,11 +161,29 @@ with st.sidebar:
     if st.button("🔄 ATUALIZAR TUDO", type="primary", use_container_width=True):
         executar_atualizacao_geral()
         st.rerun()
-    if st.button("🗑️ Resetar Memória"):
+    if st.button("🗑️ Resetar Memória", help="Limpa filtros e carrinhos desta sessão; os dados dos jogos ficam no cache compartilhado."):
         st.session_state.clear()
         st.rerun()
     
     st.divider()
+
+    # --- PAINEL DE PERFORMANCE ---
+    with st.expander("⏱️ Performance", expanded=False):
+        perf_sessao.ativo = st.toggle("Instrumentação ativa", value=perf_sessao.ativo, key="perf_ativo", help="Só nesta sessão; o agendador mede com FRACTALV_PERF=1.")
+        origem = st.radio("Medições", ["Esta sessão", "Agendador"], horizontal=True, key="perf_origem")
+        registro = perf_sessao if origem == "Esta sessão" else INSTRUMENTACAO
+        perf = registro.resumo()
+        st.caption(f"Execução {perf['execucao']['id']} · início {perf['execucao']['inicio']}")
+        if perf['spans']:
+            df_spans = pd.DataFrame([{"Etapa": k, "Chamadas": v['chamadas'], "Total (s)": round(v['total_s'], 3), "Máx (s)": round(v['max_s'], 3)} for k, v in perf['spans'].items()])
+            st.dataframe(df_spans.sort_values(by='Total (s)', ascending=False), hide_index=True, use_container_width=True)
+        if perf['contadores']: st.json(perf['contadores'])
+        if perf['excecoes']:
+            st.warning(f"{sum(v['quantidade'] for v in perf['excecoes'].values())} exceções tratadas")
+            st.json(perf['excecoes'])
+        st.download_button("📥 Exportar JSON", registro.exportar_json(), f"fractalv_perf_{perf['execucao']['id']}.json", "application/json", use_container_width=True)
+
+    st.divider()
     
     # --- GUIA COMPLETO ---
     with st.expander("📘 Guia do Operador", expanded=False):
@@ -133,6 +218,9 @@ with st.sidebar:
         
         **⚖️ Equilíbrio (Híbrido):**
         Usa 60% do caixa para um jogo forte e 40% para jogos simples (cobertura).
+        
+        **🧮 Ótimo (Sem Troco):**
+        Testa todas as combinações de apostas da tabela e escolhe a que gasta mais do orçamento, com apostas mais fortes no desempate.
         """)
         
         st.markdown("---")
@@ -142,18 +230,45 @@ with st.sidebar:
         **Markov:** Padrões sequenciais.
         **Hurst:** Tendência de mercado.
         **Gauss:** Estatística pura.
+        
+        **p-valor:** Chance de um jogador aleatório fazer o mesmo placar. Acima de 0,05 o vencedor pode ser só sorte.
+        **Atraso / Seguidas / Parceira:** Concursos desde a última saída, saídas consecutivas até o último concurso e a dezena que mais saiu junto nos últimos 100.
+        """)
+
+        st.markdown("---")
+        st.markdown("### 🕙 Rotina das 22h10")
+        st.markdown("""
+        Depois das 22h10 o sistema confere as planilhas a cada 5 minutos e recalcula sozinho, em segundo plano, só os jogos com concurso novo. O status fica no rodapé da barra lateral.
         """)
 
 # --- 5. AUTO-START ---
+# A abertura não calcula: tenta o que a rotina noturna deixou no disco e, se faltar algo, pede ao
+# agendador uma verificação em segundo plano. Os cartões aparecem quando ele publicar.
+agendador = obter_agendador()
 if 'startup_check' not in st.session_state:
     st.session_state['startup_check'] = True
-    if f'dados_{JOGOS_LISTA[0]}' not in st.session_state:
-        executar_atualizacao_geral()
+    if not CACHE_JOGOS.completo(JOGOS_LISTA) and CACHE_JOGOS.atualizacao.acquire(blocking=False):
+        try:
+            if not CACHE_JOGOS.completo(JOGOS_LISTA) and not carregar_resultados_noturnos(): agendador.acordar()
+        finally: CACHE_JOGOS.atualizacao.release()
+st.session_state['geracao_vista'] = CACHE_JOGOS.geracao
+
+@st.fragment(run_every=5)
+def acompanhar_agendador():
+    """Status do agendador; quando ele publica uma geração nova, a página inteira é refeita."""
+    estado = agendador.estado
+    if estado['ocupado']: st.caption(f"⏳ Calculando em segundo plano: {estado['etapa']}")
+    elif estado['ultima_publicacao']: st.caption(f"🕙 Última publicação {estado['ultima_publicacao']:%d/%m %H:%M}: {', '.join(estado['publicados'])}")
+    else: st.caption(f"🕙 Próxima verificação: {agendador.proximo_corte(agendador.relogio.agora()):%d/%m %H:%M}")
+    if CACHE_JOGOS.geracao != st.session_state.get('geracao_vista'): st.rerun()
+
+with st.sidebar: acompanhar_agendador()
 
 # --- 6. PAINEL PRINCIPAL ---
+token_render = INSTRUMENTACAO.iniciar("render")
 st.title("Painel Estratégico de Lotarias")
 
-otimizador = OtimizadorFinanceiro(LINKS_CSV.get("VALORES"))
+otimizador = CACHE_JOGOS.ler('otimizador') or OtimizadorFinanceiro(LINKS_CSV.get("VALORES"))
 cols_layout = st.columns(2)
 
 for i, jogo in enumerate(JOGOS_LISTA):
@@ -165,30 +280,64 @@ for i, jogo in enumerate(JOGOS_LISTA):
             with c_btn:
                 if st.button("🔄 Atualizar", key=f"up_{jogo}", help="Atualizar apenas este jogo"):
                     with st.spinner(f"Atualizando {jogo}..."):
-                        dados = processar_jogo_individual(jogo)
-                        st.session_state[f'dados_{jogo}'] = dados
-                        if f'res_{jogo}' in st.session_state: del st.session_state[f'res_{jogo}']
+                        atualizar_jogo(jogo)
                         st.rerun()
 
-            if f'dados_{jogo}' in st.session_state and st.session_state[f'dados_{jogo}'] is not None:
-                df, cols_dezenas, vencedor, score_total, placar_dict, freq = st.session_state[f'dados_{jogo}']
+            # A sessão guarda só a versão que está vendo: dados novos descartam o carrinho antigo
+            dados = CACHE_JOGOS.obter(jogo)
+            if st.session_state.get(f'versao_{jogo}') != CACHE_JOGOS.versao(jogo):
+                st.session_state[f'versao_{jogo}'] = CACHE_JOGOS.versao(jogo)
+                st.session_state.pop(f'res_{jogo}', None)
+            if dados is not None:
+                matriz, cols_dezenas, vencedor, score_total, placar_dict, freq, fractal, significancia = dados
                 
                 c1, c2 = st.columns([2, 1])
                 with c1: st.markdown(f"Modelo: <span class='winner-tag'>{vencedor}</span>", unsafe_allow_html=True)
-                with c2: st.caption(f"Score (12 jogos): {score_total}")
+                with c2:
+                    # Profundidade real do backtest: a rotina noturna pode ter rodado a história inteira
+                    dobras_score = significancia.get('dobras') if significancia else None
+                    st.caption(f"Score ({dobras_score} concursos): {score_total}" if dobras_score else f"Score: {score_total}")
+                    versao_estavel = ((CACHE_JOGOS.ler('versoes') or {}).get("jogos", {}).get(jogo) or {}).get("estavel")
+                    if versao_estavel: st.caption(f"Versão estável: v{versao_estavel['versao']}")
+                    if significancia: st.caption(f"p vs. acaso: {significancia['p_vencedor']:.3f}")
 
                 tab_auditoria, tab_orc, tab_filtros, tab_mesa = st.tabs(["📊 Auditoria", "💰 Budget", "⚙️ Filtros", "🎲 Mesa"])
                 
                 with tab_auditoria:
                     if placar_dict:
                         df_placar = pd.DataFrame(list(placar_dict.items()), columns=['Modelo', 'Total Acertos'])
+                        if significancia:
+                            modelos_sig = significancia['modelos']
+                            df_placar['IC 95%'] = [f"{modelos_sig[m]['ic_score'][0]:.0f}–{modelos_sig[m]['ic_score'][1]:.0f}" if m in modelos_sig else "-" for m in df_placar['Modelo']]
+                            df_placar['p-valor'] = [round(modelos_sig[m]['p_valor'], 4) if m in modelos_sig else None for m in df_placar['Modelo']]
                         df_placar = df_placar.sort_values(by='Total Acertos', ascending=False)
                         st.dataframe(df_placar, hide_index=True, use_container_width=True)
+                    if significancia:
+                        s1, s2, s3 = st.columns(3)
+                        s1.metric("Acaso (esperado)", f"{significancia['esperado']:.1f}")
+                        s2.metric("Acaso (95%)", f"{significancia['ic_aleatorio'][0]:.0f}–{significancia['ic_aleatorio'][1]:.0f}")
+                        s3.metric("p do vencedor", f"{significancia['p_vencedor']:.3f}", help=f"Chance de o melhor de {len(significancia['modelos'])} jogadores aleatórios empatar ou superar {score_total} acertos ({significancia['simulacoes']} simulações).")
+                    if fractal:
+                        f1, f2 = st.columns(2)
+                        f1.metric("Hurst R/S (Σ)", f"{fractal['rs_agregado']:.3f}")
+                        f2.metric("Hurst DFA (Σ)", f"{fractal['dfa_agregado']:.3f}")
+                        dezenas_fr = freq.index.astype(int).to_numpy()
+                        atributos = matriz.atributos()
+                        parceiras = atributos.parceiras()
+                        df_fractal = pd.DataFrame({'Dezena': dezenas_fr, 'H (R/S)': fractal['rs'][dezenas_fr].round(3), 'H (DFA)': fractal['dfa'][dezenas_fr].round(3),
+                                                   'Freq 10': atributos.frequencia(10)[dezenas_fr], 'Freq 50': atributos.frequencia(50)[dezenas_fr], 'Freq 100': atributos.frequencia(100)[dezenas_fr],
+                                                   'Atraso': atributos.atraso()[dezenas_fr], 'Seguidas': atributos.sequencia[dezenas_fr], 'Parceira': parceiras[dezenas_fr]})
+                        st.dataframe(df_fractal.sort_values(by='H (DFA)', ascending=False), hide_index=True, use_container_width=True, height=200)
+                    curva = curva_acertos(jogo, CACHE_JOGOS.versao(jogo), CACHE_JOGOS.geracao)
+                    if len(curva) > 1:
+                        st.markdown(f"**Acerto móvel ({JANELA_CURVA} dobras)**")
+                        st.line_chart(curva, height=220)
+                        st.caption(f"{len(curva)} pontos a partir das dobras gravadas no armazém. Para estender: `python pipeline_noturno.py --profundidade 0`.")
 
                 with tab_orc:
                     modo_estrategia = st.radio(
                         "Estilo de Jogo:", 
-                        ["🎯 Potência (Multiplicador)", "⚖️ Equilíbrio (Híbrido)"], 
+                        ["🎯 Potência (Multiplicador)", "⚖️ Equilíbrio (Híbrido)", "🧮 Ótimo (Sem Troco)"], 
                         horizontal=True,
                         key=f"mode_{jogo}"
                     )
@@ -205,6 +354,7 @@ for i, jogo in enumerate(JOGOS_LISTA):
                     
                     if st.button("CALCULAR", key=f"btn_{jogo}", use_container_width=True):
                         if "Equilíbrio" in modo_estrategia: modo_key = "EQUILIBRIO"
+                        elif "Ótimo" in modo_estrategia: modo_key = "OTIMO"
                         else: modo_key = "POTENCIA"
                         
                         res = otimizador.calcular_melhor_estrategia(jogo, orcamento, modo=modo_key)
@@ -235,34 +385,31 @@ for i, jogo in enumerate(JOGOS_LISTA):
                     if f'res_{jogo}' in st.session_state:
                         res = st.session_state[f'res_{jogo}']
                         filtros = st.session_state.get(f'filtros_{jogo}', {'fixos': [], 'excluidos': []})
-                        dados_exp = []
                         st.markdown(f"**Estratégia:** {vencedor}")
-                        idx_global = 0
-                        for item in res['carrinho']:
-                            q_v = item['qtd_volantes']
-                            q_d = int(item['dezenas'])
-                            st.markdown(f"👉 **{q_v}x** Jogos de **{q_d}** dezenas:")
-                            for _ in range(q_v):
-                                idx_global += 1
-                                p = MotorInferencia.prever_proximo(vencedor, df, cols_dezenas, q_d, filtros['fixos'], filtros['excluidos'], seed_index=idx_global)
-                                html = f"<span class='game-index'>#{idx_global:02d}</span>"
-                                for n in p:
-                                    cls = "ball-fixed" if n in filtros['fixos'] else "ball-normal"
-                                    html += f"<div class='loto-ball {cls}'>{str(int(n)).zfill(2)}</div>"
-                                stats_html = calcular_stats_completas(p)
-                                score_eq = calcular_score_visual(p, q_d)
-                                cv, ci = st.columns([3, 1])
-                                cv.markdown(html, unsafe_allow_html=True)
-                                with ci: st.progress(score_eq, "Equilíbrio")
-                                st.markdown(stats_html, unsafe_allow_html=True)
-                                dados_exp.append({"Jogo": idx_global, "Dezenas": p, "Modelo": vencedor})
-                            st.divider()
-                        d1, d2 = st.columns(2)
-                        if dados_exp:
-                            txt_str = "\n".join([f"Jogo {x['Jogo']}: {x['Dezenas']}" for x in dados_exp])
-                            d1.download_button("📄 TXT", txt_str, f"{jogo}.txt")
-                            d2.download_button("📊 CSV", to_csv(dados_exp), f"{jogo}.csv", "text/csv")
+                        cobertura = st.toggle("🧩 Cobertura (carrinho sem repetidos)", key=f"cob_{jogo}", help="Monta os bilhetes em conjunto: nenhum repetido, dezenas da elite usadas por igual e pares espalhados.")
+                        mesa = montar_mesa(jogo, vencedor, matriz, res['carrinho'], filtros['fixos'], filtros['excluidos'], cobertura)
+                        for m_cob in mesa['cobertura']:
+                            st.caption(f"{m_cob['bilhetes']} bilhetes: {m_cob['duplicados']} repetidos · sobreposição média {m_cob['sobreposicao_media']:.1f} (máx. {m_cob['sobreposicao_max']}) · "
+                                       f"{m_cob['pares_cobertos']}/{m_cob['pares_possiveis']} pares da elite cobertos")
+                        total = len(mesa['bilhetes'])
+                        paginas = max(1, -(-total // BILHETES_POR_PAGINA))
+                        pagina = st.number_input(f"Página (de {paginas})", 1, paginas, 1, key=f"pag_{jogo}") if paginas > 1 else 1
+                        inicio = (pagina - 1) * BILHETES_POR_PAGINA
+                        with INSTRUMENTACAO.span("render.mesa"):
+                            st.markdown(renderizar_pagina(mesa, inicio, min(total, inicio + BILHETES_POR_PAGINA)), unsafe_allow_html=True)
+                        st.divider()
+                        if total:
+                            # O arquivo só é montado quando pedido e fica na mesa até o carrinho mudar
+                            d1, d2 = st.columns([2, 1])
+                            formato = d1.selectbox("Formato", ["csv", "txt"] + (["parquet"] if parquet_disponivel() else []), key=f"fmt_{jogo}", label_visibility="collapsed")
+                            if d2.button("📦 Preparar", key=f"exp_{jogo}", use_container_width=True):
+                                with INSTRUMENTACAO.span("exportacao"): mesa[formato] = exportar(formato, mesa['bilhetes'], vencedor)
+                            if formato in mesa: st.download_button(f"📥 Baixar {formato.upper()}", mesa[formato], f"{jogo}.{formato}", FORMATOS[formato], key=f"dl_{jogo}", use_container_width=True)
                     else: st.info("Calcule o orçamento.")
+            elif agendador.estado['ocupado']:
+                st.info("⏳ Calculando em segundo plano. O cartão aparece sozinho ao terminar.")
             else:
                 st.warning("Falha ao carregar dados.")
                 st.caption("Tente clicar no botão de atualizar.")
+
+INSTRUMENTACAO.encerrar(token_render)
@@ -0,0 +1,130 @@
+"""
+FRACTALV - Armazém de Dobras do Backtest
+Guarda em SQLite local os acertos de cada (loteria, versão do motor, modelo, dobra). A dobra é
+identificada pela impressão encadeada do sorteio-alvo e de toda a história anterior a ele
+(MatrizSorteios.impressoes_historico), então um resultado gravado continua válido quando entram
+sorteios novos e deixa de valer sozinho se a base antiga for corrigida. Na atualização, só as
+dobras dos sorteios novos são calculadas; um backtest da história inteira pode ser interrompido
+e retomado, pois cada tarefa concluída é gravada na hora.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+import pandas as pd
+from motor_matematico import BacktestIncremental, MotorInferencia
+from ingestao import DIRETORIO_CACHE
+from instrumentacao import INSTRUMENTACAO
+
+CAMINHO_ARMAZEM = os.path.join(DIRETORIO_CACHE, "dobras.sqlite")
+
+def versao_motor(parametros=None, intervalo_ia=1):
+    """
+    Chave da versão: versão do código de pontuação (BacktestIncremental.VERSAO) + parâmetros
+    completos (padrões incluídos) + intervalo de reajuste da IA.
+    """
+    return repr((BacktestIncremental.VERSAO, sorted({**BacktestIncremental.PARAMETROS, **(parametros or {})}.items()), intervalo_ia))
+
+class ArmazemDobras:
+    def __init__(self, caminho=CAMINHO_ARMAZEM):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self._criado = False
+
+    def _conectar(self):
+        if not self._criado:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        if not self._criado:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("""CREATE TABLE IF NOT EXISTS dobras (
+                loteria TEXT, versao TEXT, modelo TEXT, impressao TEXT,
+                posicao INTEGER, concurso INTEGER, acertos INTEGER,
+                PRIMARY KEY (loteria, versao, modelo, impressao))""")
+            self._criado = True
+        return conexao
+
+    # --- LEITURA / GRAVAÇÃO ---
+    def ler(self, loteria, versao):
+        """{impressão da dobra: {modelo: acertos}} de tudo o que já foi calculado para a versão."""
+        with self._trava, closing(self._conectar()) as conexao:
+            linhas = conexao.execute("SELECT impressao, modelo, acertos FROM dobras WHERE loteria=? AND versao=?", (loteria, versao)).fetchall()
+        salvos = {}
+        for impressao, modelo, acertos in linhas: salvos.setdefault(impressao, {})[modelo] = acertos
+        return salvos
+
+    def gravar(self, matriz, versao, por_dobra):
+        """por_dobra: {dobra: {modelo: acertos}} com os índices da matriz (mais novo = 0)."""
+        prefixos = matriz.impressoes_historico()
+        concursos = matriz.concursos
+        registros = [(matriz.loteria, versao, modelo, prefixos[i], matriz.n - 1 - i,
+                      int(concursos[i]) if concursos is not None else None, int(acertos))
+                     for i, valores in por_dobra.items() for modelo, acertos in valores.items()]
+        if not registros: return
+        with self._trava, closing(self._conectar()) as conexao, conexao:
+            conexao.executemany("INSERT OR REPLACE INTO dobras VALUES (?, ?, ?, ?, ?, ?, ?)", registros)
+        INSTRUMENTACAO.contar("armazem_dobras.gravadas", len(registros))
+
+    def historico(self, matriz, versao):
+        """
+        Acertos por dobra da história atual da matriz (uma linha por sorteio-alvo, mais antigo
+        primeiro, colunas = modelos), só com o que já está gravado: não recalcula nada.
+        """
+        salvos = self.ler(matriz.loteria, versao)
+        prefixos = matriz.impressoes_historico()
+        linhas = []
+        for i in range(matriz.n - 1, -1, -1):
+            valores = salvos.get(prefixos[i])
+            if valores: linhas.append({"Concurso": int(matriz.concursos[i]) if matriz.concursos is not None else matriz.n - 1 - i, **valores})
+        return pd.DataFrame(linhas).set_index("Concurso") if linhas else pd.DataFrame()
+
+    # --- BACKTEST RETOMÁVEL ---
+    def pendentes(self, matriz, versao, profundidade=12, salvos=None):
+        """{modelo: dobras ainda não gravadas} entre as `profundidade` mais recentes (None = história inteira)."""
+        salvos = self.ler(matriz.loteria, versao) if salvos is None else salvos
+        prefixos = matriz.impressoes_historico()
+        dobras = range(MotorInferencia.profundidade_possivel(matriz.n, profundidade))
+        return {nome: [i for i in dobras if nome not in salvos.get(prefixos[i], {})] for nome in BacktestIncremental.MODELOS}
+
+    def completar(self, matrizes, profundidade=12, intervalo_ia=None, workers=None, progresso=None, parametros=None):
+        """
+        Mesmo contrato de ExecutorBacktest.executar_dobras ({jogo: {dobra: {modelo: acertos}}}), mas
+        lendo do armazém o que já foi calculado e gravando cada tarefa nova assim que termina.
+        workers=1 calcula em série, no próprio processo. intervalo_ia=None usa
+        MotorInferencia.intervalo_ia_padrao(profundidade).
+        """
+        parametros = parametros or {}
+        if intervalo_ia is None: intervalo_ia = MotorInferencia.intervalo_ia_padrao(profundidade)
+        versoes = {jogo: versao_motor(parametros.get(jogo), intervalo_ia) for jogo in matrizes}
+        salvos, faltando = {}, {}
+        for jogo, matriz in matrizes.items():
+            if matriz is None: continue
+            salvos[jogo] = self.ler(matriz.loteria, versoes[jogo])
+            faltando[jogo] = self.pendentes(matriz, versoes[jogo], profundidade, salvos[jogo])
+            INSTRUMENTACAO.contar("armazem_dobras.pendentes", sum(len(d) for d in faltando[jogo].values()))
+
+        def gravar(jogo, por_dobra):
+            self.gravar(matrizes[jogo], versoes[jogo], por_dobra)
+
+        if workers == 1:
+            for jogo, dobras_por_modelo in faltando.items():
+                motor = BacktestIncremental(matrizes[jogo], **(parametros.get(jogo) or {}))
+                for nome, dobras in dobras_por_modelo.items():
+                    try:
+                        with INSTRUMENTACAO.span("backtest"): gravar(jogo, motor.avaliar(dobras, [nome], intervalo_ia))
+                    except Exception as e: INSTRUMENTACAO.excecao(f"backtest.{jogo}", e)
+        elif any(len(d) for por_modelo in faltando.values() for d in por_modelo.values()):
+            from executor_paralelo import ExecutorBacktest
+            ExecutorBacktest(workers).executar_dobras({jogo: matrizes[jogo] for jogo in faltando}, profundidade, intervalo_ia, progresso,
+                                                      parametros, pendentes=faltando, ao_concluir=gravar)
+
+        resultados = {}
+        for jogo, matriz in matrizes.items():
+            if matriz is None:
+                resultados[jogo] = None
+                continue
+            atuais, prefixos = self.ler(matriz.loteria, versoes[jogo]), matriz.impressoes_historico()
+            dobras = range(MotorInferencia.profundidade_possivel(matriz.n, profundidade))
+            # Dobra incompleta (tarefa que falhou) fica de fora, como no backtest em memória
+            resultados[jogo] = {i: atuais[prefixos[i]] for i in dobras if len(atuais.get(prefixos[i], {})) == len(BacktestIncremental.MODELOS)}
+        return resultados
@@ -0,0 +1,167 @@
+"""
+FRACTALV - Benchmark Reprodutível
+Mede o custo do motor sem depender do Google Sheets: gera históricos sintéticos no formato
+de cada jogo (FORMATOS_JOGOS), cronometra cada modelo, o backtest em várias profundidades,
+a geração de carrinhos de 1 a 1000 bilhetes e o otimizador financeiro, e emite JSON
+comparável entre versões ("Nunca presuma, valide").
+
+Uso:
+    python benchmark.py                                  # padrão, JSON no stdout
+    python benchmark.py --tamanhos 500 5000 --jogos MEGA_SENA --saida bench.json
+    python benchmark.py --comparar antes.json depois.json
+"""
+import argparse
+import io
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from links_planilhas import FORMATOS_JOGOS
+from motor_matematico import MatrizSorteios, BacktestIncremental, MotorInferencia, OtimizadorFinanceiro, AtributosDezenas, CACHE_RANKING
+from exportacao import escrever, partes_csv
+
+TAMANHOS = (500, 5000, 20000, 100000)
+PROFUNDIDADES = (12, 50, 200)
+CARRINHOS = (1, 10, 100, 1000)
+ORCAMENTOS = (50, 500, 5000)
+
+# --- GERADORES SINTÉTICOS ---
+def gerar_sorteios(jogo, n, semente=0):
+    """(n x sorteadas) em uint8, mais novo primeiro, sorteio uniforme sem reposição."""
+    f = FORMATOS_JOGOS[jogo]
+    rng = np.random.default_rng(semente)
+    saida = np.empty((n, f["sorteadas"]), dtype=np.uint8)
+    for inicio in range(0, n, 20000):
+        fim = min(inicio + 20000, n)
+        chaves = rng.random((fim - inicio, f["universo"]))
+        escolhidas = np.argpartition(chaves, f["sorteadas"], axis=1)[:, :f["sorteadas"]]
+        saida[inicio:fim] = np.sort(escolhidas, axis=1) + f["inicio"]
+    return saida
+
+def gerar_historico(jogo, n, semente=0):
+    """DataFrame no formato da planilha: Concurso, D1..Dk, do mais novo para o mais antigo."""
+    sorteios = gerar_sorteios(jogo, n, semente)
+    df = pd.DataFrame(sorteios.astype(int), columns=[f"D{i + 1}" for i in range(sorteios.shape[1])])
+    df.insert(0, "Concurso", np.arange(n, 0, -1))
+    return df
+
+def gerar_matriz(jogo, n, semente=0):
+    sorteios = gerar_sorteios(jogo, n, semente)
+    cols = [f"D{i + 1}" for i in range(sorteios.shape[1])]
+    return MatrizSorteios.de_arrays(sorteios, np.ones(sorteios.shape, dtype=bool), cols, loteria=jogo, concursos=np.arange(n, 0, -1))
+
+def gerar_tabela_precos(jogos=None):
+    """Tabela no formato da aba VALORES: preço = preço base x combinações da aposta mínima."""
+    linhas = []
+    for jogo in (jogos or FORMATOS_JOGOS):
+        f = FORMATOS_JOGOS[jogo]
+        for dezenas in range(f["aposta_min"], f["aposta_max"] + 1):
+            preco = f["preco_base"] * math.comb(dezenas, f["aposta_min"])
+            texto = f"R$ {preco:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+            linhas.append({"Loteria": jogo.replace("_", " ").title(), "Qtd. Dezenas": dezenas, "Preço Total (R$)": texto})
+    return pd.DataFrame(linhas)
+
+# --- CRONÔMETRO ---
+def cronometrar(funcao, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {"mediana_s": float(np.median(tempos)), "minimo_s": float(min(tempos)), "repeticoes": repeticoes}
+
+def _revisao():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+# --- SUÍTE ---
+def executar_suite(jogos=None, tamanhos=TAMANHOS, profundidades=PROFUNDIDADES, carrinhos=CARRINHOS,
+                   orcamentos=ORCAMENTOS, repeticoes=3, limite_ia=10000, semente=0, log=None):
+    """limite_ia: acima desse tamanho a IA (ajuste da floresta) fica fora das medições."""
+    jogos = list(jogos or FORMATOS_JOGOS)
+    resultados = []
+    def registrar(grupo, jogo, tamanho, parametro, medida):
+        resultados.append({"grupo": grupo, "jogo": jogo, "tamanho": tamanho, "parametro": parametro, **medida})
+        if log: log(f"{grupo:10s} {jogo:13s} {str(tamanho):>7s} {str(parametro):>24s} {medida['mediana_s']:.4f}s")
+
+    for jogo in jogos:
+        qtd = FORMATOS_JOGOS[jogo]["sorteadas"]
+        for tamanho in tamanhos:
+            registrar("matriz", jogo, tamanho, None, cronometrar(lambda: gerar_matriz(jogo, tamanho, semente), repeticoes))
+            matriz = gerar_matriz(jogo, tamanho, semente)
+            nomes = [n for n, t in BacktestIncremental.MODELOS.items() if t != "IA" or tamanho <= limite_ia]
+            for nome in nomes:
+                tipo = BacktestIncremental.MODELOS[nome]
+                registrar("ranking", jogo, tamanho, nome, cronometrar(lambda: BacktestIncremental(matriz).ranking(tipo, 0, max(qtd * 3, 40)), repeticoes))
+            for profundidade in profundidades:
+                if tamanho < profundidade + 50: continue
+                medida = cronometrar(lambda: BacktestIncremental(matriz).avaliar(range(profundidade), nomes), repeticoes)
+                registrar("backtest", jogo, tamanho, f"{profundidade} dobras/{len(nomes)} modelos", medida)
+                def percorrer():
+                    atributos = AtributosDezenas(matriz, profundidade)
+                    for cursor in range(profundidade - 1, -1, -1): atributos.posicionar(cursor)
+                registrar("atributos", jogo, tamanho, f"{profundidade} passos", cronometrar(percorrer, repeticoes))
+            for qtd_bilhetes in carrinhos:
+                def frio():
+                    CACHE_RANKING.limpar()
+                    MotorInferencia.gerar_lote("Gauss (Normal)", matriz, None, qtd, qtd_bilhetes)
+                registrar("bilhetes", jogo, tamanho, f"{qtd_bilhetes} frio", cronometrar(frio, repeticoes))
+                registrar("bilhetes", jogo, tamanho, f"{qtd_bilhetes} quente", cronometrar(lambda: MotorInferencia.gerar_lote("Gauss (Normal)", matriz, None, qtd, qtd_bilhetes), repeticoes))
+                registrar("bilhetes", jogo, tamanho, f"{qtd_bilhetes} cobertura", cronometrar(lambda: MotorInferencia.gerar_cobertura("Gauss (Normal)", matriz, None, qtd, qtd_bilhetes), repeticoes))
+                lote = MotorInferencia.gerar_bilhetes("Gauss (Normal)", matriz, None, qtd, qtd_bilhetes)
+                registrar("exportacao", jogo, tamanho, f"{qtd_bilhetes} csv", cronometrar(lambda: escrever(io.BytesIO(), partes_csv(lote, "Gauss (Normal)")), repeticoes))
+
+        otimizador = OtimizadorFinanceiro(None)
+        otimizador.carregar_dados(gerar_tabela_precos([jogo]))
+        for orcamento in orcamentos:
+            for modo in ("POTENCIA", "EQUILIBRIO", "OTIMO"):
+                registrar("orcamento", jogo, None, f"{modo} R${orcamento}", cronometrar(lambda: otimizador.calcular_melhor_estrategia(jogo, orcamento, modo), repeticoes))
+        curva = list(range(1, max(orcamentos) + 1))
+        registrar("orcamento", jogo, None, f"curva 1..{max(orcamentos)}", cronometrar(lambda: otimizador.curva_orcamento(jogo, curva), repeticoes))
+
+    meta = {"revisao": _revisao(), "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "plataforma": platform.platform(), "semente": semente, "repeticoes": repeticoes, "limite_ia": limite_ia}
+    return {"meta": meta, "resultados": resultados}
+
+def comparar(antes, depois):
+    """Razão depois/antes da mediana para cada medição presente nos dois relatórios."""
+    chave = lambda r: (r["grupo"], r["jogo"], r["tamanho"], r["parametro"])
+    base = {chave(r): r for r in antes["resultados"]}
+    linhas = []
+    for r in depois["resultados"]:
+        if chave(r) in base and base[chave(r)]["mediana_s"] > 0:
+            linhas.append({"chave": chave(r), "antes_s": base[chave(r)]["mediana_s"], "depois_s": r["mediana_s"], "razao": r["mediana_s"] / base[chave(r)]["mediana_s"]})
+    return linhas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark reprodutível do FRACTALV")
+    parser.add_argument("--jogos", nargs="+", choices=list(FORMATOS_JOGOS))
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=list(TAMANHOS))
+    parser.add_argument("--profundidades", nargs="+", type=int, default=list(PROFUNDIDADES))
+    parser.add_argument("--carrinhos", nargs="+", type=int, default=list(CARRINHOS))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--limite-ia", type=int, default=10000)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="arquivo JSON (padrão: stdout)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        with open(args.comparar[0]) as a, open(args.comparar[1]) as b:
+            for linha in comparar(json.load(a), json.load(b)):
+                print(f"{' | '.join(str(c) for c in linha['chave'])}: {linha['antes_s']:.4f}s -> {linha['depois_s']:.4f}s (x{linha['razao']:.2f})")
+        return
+
+    relatorio = executar_suite(args.jogos, args.tamanhos, args.profundidades, args.carrinhos, ORCAMENTOS,
+                               args.repeticoes, args.limite_ia, args.semente, log=lambda m: print(m, file=sys.stderr))
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w") as f: f.write(texto)
+    else: print(texto)
+
+if __name__ == "__main__":
+    main()
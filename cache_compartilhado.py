@@ -0,0 +1,68 @@
+"""
+FRACTALV - Cache Compartilhado entre Sessões
+Um por processo do Streamlit. Guarda os dados processados de cada jogo (matriz, placar,
+frequência, fractal, significância) sob a versão dos dados: impressão da base + parâmetros da
+versão estável do motor. Cada sessão guarda só a versão que está vendo e seus próprios
+filtros/carrinhos, então N operadores custam uma cópia dos dados e um backtest por atualização.
+Um sorteio novo muda a impressão e invalida só o jogo afetado.
+"""
+import threading
+from instrumentacao import INSTRUMENTACAO
+
+def versao_dados(matriz, parametros=None):
+    return (matriz.impressao, repr(sorted((parametros or {}).items())))
+
+class CacheJogos:
+    def __init__(self):
+        self._trava = threading.Lock()
+        # Reentrante: a abertura tenta a rotina noturna e, se falhar, a atualização geral, sob a mesma trava
+        self.atualizacao = threading.RLock()
+        # (entradas, globais) trocados juntos numa única atribuição
+        self._estado = ({}, {})
+        self.geracao = 0
+
+    @property
+    def entradas(self): return self._estado[0]
+
+    @property
+    def globais(self): return self._estado[1]
+
+    # --- DADOS POR JOGO ---
+    def versao(self, jogo):
+        entrada = self.entradas.get(jogo)
+        return entrada[0] if entrada else None
+
+    def obter(self, jogo):
+        entrada = self.entradas.get(jogo)
+        INSTRUMENTACAO.contar("cache_compartilhado.acerto" if entrada else "cache_compartilhado.falta")
+        return entrada[1] if entrada else None
+
+    def atual(self, jogo, versao):
+        return versao is not None and self.versao(jogo) == versao
+
+    def completo(self, jogos):
+        return all(self.entradas.get(jogo) for jogo in jogos)
+
+    def publicar(self, dados_por_jogo, globais=None):
+        """
+        dados_por_jogo: {jogo: (versao, dados)}. Troca as entradas e os globais de uma vez: quem
+        lê durante a atualização vê a geração anterior inteira ou a nova, nunca uma mistura.
+        Jogos que falharam (dados None) mantêm a entrada anterior e são tentados de novo.
+        """
+        dados_por_jogo = {jogo: e for jogo, e in dados_por_jogo.items() if e[1] is not None}
+        with self._trava:
+            entradas, atuais = self._estado
+            self._estado = ({**entradas, **dados_por_jogo}, {**atuais, **(globais or {})})
+            self.geracao += 1
+        INSTRUMENTACAO.contar("cache_compartilhado.publicacao", len(dados_por_jogo))
+
+    # --- GLOBAIS (tabela de preços, otimizador, versões do motor) ---
+    def ler(self, nome, padrao=None):
+        return self.globais.get(nome, padrao)
+
+    def limpar(self):
+        with self._trava:
+            self._estado = ({}, {})
+            self.geracao += 1
+
+CACHE_JOGOS = CacheJogos()
@@ -0,0 +1,138 @@
+"""
+FRACTALV - Executor Paralelo do Backtest
+Distribui tarefas (loteria, modelo, dobras) por um pool de processos. As dezenas de cada
+loteria são publicadas uma única vez em memória compartilhada; cada worker anexa o bloco
+na primeira tarefa daquela loteria e reaproveita a matriz nas seguintes, então nenhuma
+tarefa serializa a história. Os acertos voltam por dobra e são somados no mesmo formato
+de placar do backtest serial.
+"""
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from motor_matematico import MatrizSorteios, BacktestIncremental, MotorInferencia
+from instrumentacao import INSTRUMENTACAO
+
+_MATRIZES = {}
+
+def _anexar(nome):
+    # Python < 3.13 não tem track=False; o worker (spawn) usa o mesmo rastreador do processo
+    # principal, que continua sendo o único responsável pelo unlink do bloco.
+    try: return shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError: return shared_memory.SharedMemory(name=nome)
+
+def _matriz_worker(descritor):
+    nome = descritor["nome"]
+    if nome not in _MATRIZES:
+        shm = _anexar(nome)
+        n, k = descritor["forma"]
+        dezenas = np.ndarray((n, k), dtype=np.uint8, buffer=shm.buf)
+        valido = np.ndarray((n, k), dtype=bool, buffer=shm.buf, offset=n * k)
+        # O bloco fica anexado enquanto o worker viver: a matriz lê a máscara direto dele
+        _MATRIZES[nome] = (shm, MatrizSorteios.de_arrays(dezenas, valido, descritor["cols"], loteria=descritor["loteria"]))
+    return _MATRIZES[nome][1]
+
+def _tarefa(descritor, nome_modelo, dobras, intervalo_ia, parametros=None, instrumentar=False):
+    """
+    (acertos por dobra, medições da tarefa). Cada tarefa mede num registro próprio e devolve o
+    resumo junto, para o processo principal somar com INSTRUMENTACAO.mesclar: spans,
+    contadores e exceções engolidas (ex.: ranking.IA) aparecem no painel de Performance.
+    """
+    with INSTRUMENTACAO.nova_execucao(instrumentar) as medicoes:
+        motor = BacktestIncremental(_matriz_worker(descritor), **(parametros or {}))
+        with INSTRUMENTACAO.span("backtest.tarefa"): por_dobra = motor.avaliar(dobras, [nome_modelo], intervalo_ia)
+    return por_dobra, medicoes.resumo()
+
+def publicar(jogo, matriz):
+    """Copia dezenas e máscara para um bloco de memória compartilhada; devolve (bloco, descritor para os workers)."""
+    n, k = matriz.dezenas.shape
+    shm = shared_memory.SharedMemory(create=True, size=max(2 * n * k, 1))
+    np.ndarray((n, k), dtype=np.uint8, buffer=shm.buf)[:] = matriz.dezenas
+    np.ndarray((n, k), dtype=bool, buffer=shm.buf, offset=n * k)[:] = matriz.valido
+    return shm, {"nome": shm.name, "forma": (n, k), "cols": matriz.cols, "loteria": jogo}
+
+def tarefas_modelo(nome, dobras, intervalo_ia=1, dobras_por_tarefa=None, n=None):
+    """
+    Divide as dobras (ordenadas) de um modelo em tarefas. Com n (tamanho da matriz), a IA vai
+    em blocos que coincidem com as posições de ajuste da floresta (um ajuste por tarefa); sem n,
+    blocos de intervalo_ia dobras a partir da mais antiga. O resultado é o mesmo nos dois casos.
+    """
+    dobras = sorted(dobras)
+    passo = max(1, intervalo_ia) if BacktestIncremental.MODELOS[nome] == "IA" else (dobras_por_tarefa or len(dobras) or 1)
+    if n is not None and BacktestIncremental.MODELOS[nome] == "IA":
+        blocos = {}
+        for i in dobras: blocos.setdefault((n - 1 - i) // passo, []).append(i)
+        yield from (blocos[b] for b in sorted(blocos))
+        return
+    for fim in range(len(dobras), 0, -passo):
+        yield dobras[max(0, fim - passo):fim]
+
+class ExecutorBacktest:
+    """
+    max_workers=None usa todos os núcleos. dobras_por_tarefa controla a granularidade dos
+    modelos baratos (que andam de forma incremental dentro da tarefa); a IA vai em blocos de
+    intervalo_ia dobras (uma por tarefa no padrão), pois cada ajuste da floresta é independente.
+    """
+    def __init__(self, max_workers=None, dobras_por_tarefa=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.dobras_por_tarefa = dobras_por_tarefa
+
+    def _tarefas(self, dobras_por_modelo, intervalo_ia, n=None):
+        for nome, dobras in dobras_por_modelo.items():
+            for bloco in tarefas_modelo(nome, dobras, intervalo_ia, self.dobras_por_tarefa, n): yield nome, bloco
+
+    def executar(self, matrizes, profundidade=12, intervalo_ia=1, progresso=None, parametros=None):
+        """
+        matrizes: {jogo: MatrizSorteios}. Devolve {jogo: (melhor, score, placar)} com o mesmo
+        contrato de executar_backtest_profundo. progresso(feitas, total, jogo) é chamado no
+        processo principal a cada tarefa concluída (ex.: para atualizar o st.progress).
+        parametros: {jogo: versão do motor} opcional (ex.: as versões estáveis da varredura).
+        """
+        dobras = self.executar_dobras(matrizes, profundidade, intervalo_ia, progresso, parametros)
+        return {jogo: (MotorInferencia.resumir_backtest(por_dobra) if por_dobra is not None else None) for jogo, por_dobra in dobras.items()}
+
+    def executar_dobras(self, matrizes, profundidade=12, intervalo_ia=1, progresso=None, parametros=None, pendentes=None, ao_concluir=None):
+        """
+        Como executar, mas devolve {jogo: {dobra: {modelo: acertos}}} (None se a matriz faltar, {} se
+        sem dobras ou com falha). pendentes: {jogo: {modelo: dobras}} restringe o cálculo (ex.: só o
+        que falta no ArmazemDobras); ao_concluir(jogo, por_dobra) recebe cada tarefa ao terminar.
+        """
+        resultados, blocos, acertos = {}, [], {}
+        validas = {}
+        for jogo, matriz in matrizes.items():
+            if matriz is None: resultados[jogo] = None
+            elif pendentes is not None: validas[jogo] = pendentes.get(jogo) or {}
+            else:
+                possivel = MotorInferencia.profundidade_possivel(len(matriz), profundidade)
+                validas[jogo] = {nome: range(possivel) for nome in BacktestIncremental.MODELOS} if possivel > 0 else {}
+        try:
+            envios = []
+            for jogo, dobras_por_modelo in validas.items():
+                acertos[jogo] = {}
+                if not any(len(d) for d in dobras_por_modelo.values()): continue
+                shm, descritor = publicar(jogo, matrizes[jogo])
+                blocos.append(shm)
+                envios += [(jogo, descritor, nome, dobras) for nome, dobras in self._tarefas(dobras_por_modelo, intervalo_ia, len(matrizes[jogo]))]
+            if not envios: return {**resultados, **acertos}
+            with INSTRUMENTACAO.span("backtest.paralelo"), ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context("spawn")) as pool:
+                parametros = parametros or {}
+                futuros = {pool.submit(_tarefa, descritor, nome, dobras, intervalo_ia, parametros.get(jogo), INSTRUMENTACAO.medindo()): jogo for jogo, descritor, nome, dobras in envios}
+                for feitas, futuro in enumerate(as_completed(futuros), start=1):
+                    jogo = futuros[futuro]
+                    try:
+                        por_dobra, medicoes = futuro.result()
+                        INSTRUMENTACAO.mesclar(medicoes)
+                        if ao_concluir: ao_concluir(jogo, por_dobra)
+                        if acertos[jogo] is not None:
+                            for dobra, valores in por_dobra.items(): acertos[jogo].setdefault(dobra, {}).update(valores)
+                    except Exception as e:
+                        INSTRUMENTACAO.excecao(f"backtest.paralelo.{jogo}", e)
+                        acertos[jogo] = None
+                    if progresso: progresso(feitas, len(envios), jogo)
+            for jogo, por_dobra in acertos.items(): resultados[jogo] = por_dobra or {}
+            return resultados
+        finally:
+            for shm in blocos:
+                shm.close()
+                shm.unlink()
@@ -0,0 +1,128 @@
+"""
+FRACTALV - Exportação dos Bilhetes
+Escreve o lote de bilhetes (array int16, uma linha por bilhete, -1 = vazio) direto em CSV, TXT
+ou Parquet, em blocos. A formatação é vetorizada: cada número vira uma fatia de bytes de largura
+fixa (dígitos à direita, NUL à esquerda) e um bloco inteiro é montado numa matriz de bytes, da
+qual os NUL são removidos de uma vez. A memória fica presa ao tamanho do bloco, não do lote.
+pyarrow só é importado quando o Parquet é pedido.
+"""
+import numpy as np
+
+TAMANHO_BLOCO = 8192
+FORMATOS = {"csv": "text/csv", "txt": "text/plain", "parquet": "application/vnd.apache.parquet"}
+
+def _literal(texto, linhas):
+    return np.broadcast_to(np.frombuffer(texto.encode("utf-8"), dtype=np.uint8), (linhas, len(texto.encode("utf-8"))))
+
+def _inteiros(valores, largura=None):
+    """(linhas x largura) bytes ASCII de inteiros >= 0 alinhados à direita; posições à esquerda e valores < 0 ficam NUL."""
+    valores = np.asarray(valores, dtype=np.int64)
+    if largura is None: largura = len(str(int(valores.max()))) if valores.size else 1
+    potencias = 10 ** np.arange(largura - 1, -1, -1, dtype=np.int64)
+    positivos = np.maximum(valores, 0)[:, None]
+    saida = (positivos // potencias % 10 + ord("0")).astype(np.uint8)
+    # Zeros à esquerda viram NUL (o último dígito sempre fica, para o zero aparecer)
+    saida[(positivos < potencias) & (potencias > 1)] = 0
+    saida[valores < 0] = 0
+    return saida
+
+def _dezenas(bilhetes):
+    """Bytes de "1, 2, 3" por linha: separador só antes das dezenas que não são a primeira da linha."""
+    linhas = len(bilhetes)
+    validos = bilhetes >= 0
+    partes = []
+    for j in range(bilhetes.shape[1]):
+        if j:
+            separador = np.where(validos[:, j, None], _literal(", ", linhas), 0).astype(np.uint8)
+            partes.append(separador)
+        partes.append(_inteiros(bilhetes[:, j], 3))
+    return np.hstack(partes) if partes else np.zeros((linhas, 0), dtype=np.uint8)
+
+def _resumo(bilhetes):
+    validos = bilhetes >= 0
+    valores = np.where(validos, bilhetes, 0).astype(np.int64)
+    return (validos & (valores % 2 == 0)).sum(axis=1), valores.sum(axis=1)
+
+def _juntar(colunas):
+    return np.hstack(colunas).tobytes().replace(b"\x00", b"")
+
+def _campo_csv(texto):
+    """Aspas como no to_csv do pandas (QUOTE_MINIMAL): só se o campo tiver ';', aspas ou quebra de linha."""
+    if any(c in texto for c in ';"\r\n'): return '"' + texto.replace('"', '""') + '"'
+    return texto
+
+def _blocos(bilhetes, bloco):
+    bilhetes = np.atleast_2d(np.asarray(bilhetes))
+    for inicio in range(0, len(bilhetes), bloco):
+        yield inicio, bilhetes[inicio:inicio + bloco]
+
+# --- FORMATOS DE TEXTO ---
+def partes_csv(bilhetes, modelo, primeiro=1, cabecalho=True, bloco=TAMANHO_BLOCO):
+    """Bytes do CSV (Jogo;Modelo;Dezenas;Stats, separador ';') bloco a bloco."""
+    if cabecalho: yield b"Jogo;Modelo;Dezenas;Stats\n"
+    for inicio, parte in _blocos(bilhetes, bloco):
+        n = len(parte)
+        pares, soma = _resumo(parte)
+        yield _juntar([_inteiros(np.arange(primeiro + inicio, primeiro + inicio + n)), _literal(f";{_campo_csv(modelo)};", n), _dezenas(parte),
+                       _literal(";P:", n), _inteiros(pares), _literal(" S:", n), _inteiros(soma), _literal("\n", n)])
+
+def partes_txt(bilhetes, primeiro=1, bloco=TAMANHO_BLOCO):
+    """Bytes do TXT ("Jogo 1: [1, 2, 3]") bloco a bloco; linhas separadas por quebra, sem quebra no fim."""
+    total = len(np.atleast_2d(np.asarray(bilhetes)))
+    for inicio, parte in _blocos(bilhetes, bloco):
+        n = len(parte)
+        dados = _juntar([_literal("Jogo ", n), _inteiros(np.arange(primeiro + inicio, primeiro + inicio + n)), _literal(": [", n),
+                         _dezenas(parte), _literal("]\n", n)])
+        yield dados[:-1] if inicio + n == total else dados
+
+def escrever(destino, partes):
+    """Grava as partes num arquivo binário aberto ou num caminho; devolve os bytes escritos."""
+    if isinstance(destino, str):
+        with open(destino, "wb") as f: return escrever(f, partes)
+    total = 0
+    for parte in partes: total += destino.write(parte)
+    return total
+
+# --- PARQUET ---
+_PARQUET = None
+
+def parquet_disponivel():
+    """Testa o pyarrow uma vez por processo (a interface pergunta a cada rerun)."""
+    global _PARQUET
+    if _PARQUET is None:
+        try:
+            import pyarrow.parquet  # noqa: F401
+            _PARQUET = True
+        except ImportError: _PARQUET = False
+    return _PARQUET
+
+def escrever_parquet(destino, bilhetes, modelo, primeiro=1, bloco=TAMANHO_BLOCO):
+    """Parquet com Jogo, Modelo, Dezenas (lista de int16), Pares e Soma, um row group por bloco."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    esquema = pa.schema([("Jogo", pa.int64()), ("Modelo", pa.string()), ("Dezenas", pa.list_(pa.int16())), ("Pares", pa.int16()), ("Soma", pa.int32())])
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for inicio, parte in _blocos(bilhetes, bloco):
+            validos = parte >= 0
+            deslocamentos = np.concatenate([[0], np.cumsum(validos.sum(axis=1))]).astype(np.int32)
+            pares, soma = _resumo(parte)
+            escritor.write_table(pa.table({
+                "Jogo": pa.array(np.arange(primeiro + inicio, primeiro + inicio + len(parte)), pa.int64()),
+                "Modelo": pa.array([modelo] * len(parte), pa.string()),
+                "Dezenas": pa.ListArray.from_arrays(pa.array(deslocamentos), pa.array(parte[validos].astype(np.int16))),
+                "Pares": pa.array(pares.astype(np.int16)), "Soma": pa.array(soma.astype(np.int32))}, schema=esquema))
+
+def exportar(formato, bilhetes, modelo, destino=None):
+    """
+    Exporta o lote no formato pedido. Sem destino devolve os bytes (para um botão de download);
+    com destino (caminho ou arquivo binário) grava em blocos e devolve None.
+    """
+    if formato == "parquet":
+        if destino is not None: return escrever_parquet(destino, bilhetes, modelo)
+        from io import BytesIO
+        saida = BytesIO()
+        escrever_parquet(saida, bilhetes, modelo)
+        return saida.getvalue()
+    partes = partes_csv(bilhetes, modelo) if formato == "csv" else partes_txt(bilhetes)
+    if destino is None: return b"".join(partes)
+    escrever(destino, partes)
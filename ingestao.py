@@ -0,0 +1,146 @@
+"""
+FRACTALV - Camada de Ingestão
+Baixa as fontes de LINKS_CSV em paralelo e guarda os sorteios já convertidos em um cache
+colunar local (.npz por jogo). Na atualização, só os concursos mais novos que o último
+armazenado são convertidos e anexados, então o custo acompanha os sorteios novos e não a
+história inteira. A fonte é plugável: Google Sheets em produção, pasta local ou servidor
+HTTP de teste como substituto.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from links_planilhas import LINKS_CSV, PARAMS_LEITURA
+from motor_matematico import MatrizSorteios
+from instrumentacao import INSTRUMENTACAO
+
+DIRETORIO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_fractalv")
+
+def colunas_dezenas(df):
+    return [c for c in df.columns if c.startswith('D') and '2º' not in c]
+
+def coluna_concurso(df):
+    for c in df.columns:
+        if 'concurso' in str(c).lower(): return c
+    return None
+
+class FonteCSV:
+    """Lê cada chave do mapeamento (URL do Google Sheets, URL HTTP qualquer ou caminho local)."""
+    def __init__(self, links=None):
+        self.links = LINKS_CSV if links is None else links
+
+    def ler(self, chave, **kwargs):
+        return pd.read_csv(self.links[chave], on_bad_lines='skip', **PARAMS_LEITURA, **kwargs)
+
+class FonteLocal(FonteCSV):
+    """Substituto do Google Sheets para testes: {diretorio}/{CHAVE}.csv no mesmo formato."""
+    def __init__(self, diretorio):
+        super().__init__({})
+        self.diretorio = diretorio
+
+    def ler(self, chave, **kwargs):
+        return pd.read_csv(os.path.join(self.diretorio, f"{chave}.csv"), on_bad_lines='skip', **PARAMS_LEITURA, **kwargs)
+
+class IngestorDados:
+    def __init__(self, fonte=None, diretorio_cache=DIRETORIO_CACHE, max_workers=8, tamanho_bloco=64):
+        self.fonte = fonte or FonteCSV()
+        self.diretorio_cache = diretorio_cache
+        self.max_workers = max_workers
+        self.tamanho_bloco = tamanho_bloco
+        self.linhas_processadas = {}
+
+    # --- CACHE LOCAL ---
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio_cache, f"{chave}.npz")
+
+    def ler_cache(self, chave):
+        try:
+            with np.load(self._caminho(chave), allow_pickle=False) as f:
+                return {nome: f[nome] for nome in f.files}
+        except FileNotFoundError: return None
+        except (OSError, ValueError, KeyError) as e:
+            INSTRUMENTACAO.excecao("ingestao.cache", e)
+            return None
+
+    def _salvar_cache(self, chave, cache):
+        os.makedirs(self.diretorio_cache, exist_ok=True)
+        temporario = self._caminho(chave) + ".tmp.npz"
+        np.savez(temporario, **cache)
+        os.replace(temporario, self._caminho(chave))
+
+    @staticmethod
+    def _converter(df, cols, col_concurso):
+        bruto = np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=float) for c in cols]) if len(df) else np.empty((0, len(cols)))
+        valido = ~np.isnan(bruto) & (bruto >= 0) & (bruto < 256)
+        concursos = pd.to_numeric(df[col_concurso], errors='coerce').fillna(-1).to_numpy(dtype=np.int64) if col_concurso else np.full(len(df), -1, dtype=np.int64)
+        return {"dezenas": np.where(valido, bruto, 0).astype(np.uint8), "valido": valido, "concursos": concursos}
+
+    # --- LEITURA ---
+    def _completo(self, chave):
+        with INSTRUMENTACAO.span("fetch"): df = self.fonte.ler(chave)
+        cols = colunas_dezenas(df)
+        if not cols: return None
+        col_concurso = coluna_concurso(df)
+        with INSTRUMENTACAO.span("parse"): cache = self._converter(df, cols, col_concurso)
+        cache["cols"] = np.array(cols)
+        cache["incremental"] = np.array(col_concurso is not None)
+        self.linhas_processadas[chave] = len(df)
+        INSTRUMENTACAO.contar("linhas_processadas", len(df))
+        return cache
+
+    def _incremental(self, chave, cache):
+        """Lê a planilha em blocos (mais novo primeiro) até encontrar um concurso já armazenado."""
+        ultimo = int(cache["concursos"].max()) if len(cache["concursos"]) else -1
+        cols, novos = list(cache["cols"]), []
+        with INSTRUMENTACAO.span("fetch"), self.fonte.ler(chave, chunksize=self.tamanho_bloco) as leitor:
+            for bloco in leitor:
+                col_concurso = coluna_concurso(bloco)
+                if colunas_dezenas(bloco) != cols or col_concurso is None: return self._completo(chave)
+                concursos = pd.to_numeric(bloco[col_concurso], errors='coerce')
+                eh_novo = (concursos > ultimo).to_numpy()
+                novos.append(bloco[eh_novo])
+                if not eh_novo.all(): break
+        df_novos = pd.concat(novos) if novos else pd.DataFrame(columns=cols)
+        self.linhas_processadas[chave] = len(df_novos)
+        INSTRUMENTACAO.contar("linhas_processadas", len(df_novos))
+        if df_novos.empty:
+            INSTRUMENTACAO.contar("cache_local.sem_novidades")
+            return cache
+        with INSTRUMENTACAO.span("parse"): convertidos = self._converter(df_novos, cols, coluna_concurso(df_novos))
+        return {**cache, **{nome: np.concatenate([convertidos[nome], cache[nome]]) for nome in ("dezenas", "valido", "concursos")}}
+
+    def atualizar(self, chave):
+        """Atualiza o cache do jogo e devolve o dicionário de arrays (ou None se a fonte não tiver dezenas)."""
+        cache = self.ler_cache(chave)
+        if cache is None or not bool(cache.get("incremental", False)): novo = self._completo(chave)
+        else: novo = self._incremental(chave, cache)
+        if novo is not None and novo is not cache: self._salvar_cache(chave, novo)
+        return novo
+
+    @staticmethod
+    def _matriz(chave, cache):
+        if cache is None: return None
+        return MatrizSorteios.de_arrays(cache["dezenas"], cache["valido"], list(cache["cols"]), loteria=chave, concursos=cache["concursos"])
+
+    def carregar(self, chave):
+        return self._matriz(chave, self.atualizar(chave))
+
+    def carregar_local(self, chave):
+        """Só o cache em disco, sem tocar na fonte (abertura do app após a rotina noturna)."""
+        return self._matriz(chave, self.ler_cache(chave))
+
+    def carregar_valores(self, chave="VALORES"):
+        return self.fonte.ler(chave)
+
+    def carregar_todos(self, chaves, incluir_valores=True):
+        """Baixa e atualiza todas as fontes em paralelo. Falhas individuais viram None."""
+        registro = INSTRUMENTACAO.atual()  # as threads do pool medem na execução de quem chamou
+        def tarefa(chave):
+            INSTRUMENTACAO.usar(registro)
+            try: return self.carregar_valores(chave) if chave == "VALORES" else self.carregar(chave)
+            except Exception as e:
+                INSTRUMENTACAO.excecao(f"ingestao.{chave}", e)
+                return None
+        todas = list(chaves) + (["VALORES"] if incluir_valores else [])
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(todas, pool.map(tarefa, todas)))
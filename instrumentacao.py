@@ -0,0 +1,136 @@
+"""
+FRACTALV - Instrumentação
+Spans nomeados (fetch, parse, backtest, ranking por modelo, bilhetes, render), contadores
+(acertos de cache, linhas processadas) e registro das exceções engolidas pelos
+try/except do sistema. Desligada, cada span é um nullcontext compartilhado e o custo é
+desprezível; ligue pelo painel "Performance" ou com FRACTALV_PERF=1.
+
+INSTRUMENTACAO é o registro do processo, mas cada execução (rotina noturna, tarefa de um worker,
+sessão do app) mede no seu próprio registro: quem chama INSTRUMENTACAO.span/contar/excecao
+dentro de nova_execucao() ou depois de usar() grava no registro em curso naquele contexto, e nada
+zera as medições das outras execuções.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+_NULO = contextlib.nullcontext()
+# Registro da execução em curso neste contexto (thread/sessão); None = o próprio registro chamado
+_REGISTRO = contextvars.ContextVar("fractalv_instrumentacao", default=None)
+
+class Instrumentacao:
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self._trava = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Zera as medições deste registro (só dele: as outras execuções não são afetadas)."""
+        with self._trava:
+            self.execucao = {"id": uuid.uuid4().hex[:8], "inicio": datetime.now().isoformat(timespec="seconds")}
+            self.spans = {}
+            self.contadores = {}
+            self.excecoes = {}
+
+    # --- EXECUÇÕES ---
+    def _alvo(self):
+        registro = _REGISTRO.get()
+        return self if registro is None else registro
+
+    def atual(self):
+        """Registro em curso neste contexto (None = fora de qualquer execução); para repassar a threads."""
+        return _REGISTRO.get()
+
+    def usar(self, registro):
+        """Daqui em diante, neste contexto, as medições vão para registro (ex.: o da sessão do app a cada rerun)."""
+        _REGISTRO.set(registro)
+        return registro
+
+    @contextlib.contextmanager
+    def nova_execucao(self, ativo=None):
+        """Registro próprio para o bloco; no fim, suas medições são somadas ao registro de fora."""
+        registro = Instrumentacao(self.medindo() if ativo is None else ativo)
+        token = _REGISTRO.set(registro)
+        try: yield registro
+        finally:
+            _REGISTRO.reset(token)
+            self.mesclar(registro.resumo())
+
+    def medindo(self):
+        """Se o registro em curso neste contexto está ligado (ex.: para repassar aos workers)."""
+        return self._alvo().ativo
+
+    # --- SPANS ---
+    def span(self, nome):
+        alvo = self._alvo()
+        if not alvo.ativo: return _NULO
+        return alvo._span(nome)
+
+    @contextlib.contextmanager
+    def _span(self, nome):
+        inicio = time.perf_counter()
+        try: yield
+        finally: self._registrar_span(nome, time.perf_counter() - inicio)
+
+    def iniciar(self, nome):
+        """Versão sem bloco 'with' para trechos longos de script: devolve o token para encerrar()."""
+        alvo = self._alvo()
+        return (alvo, nome, time.perf_counter()) if alvo.ativo else None
+
+    def encerrar(self, token):
+        if token is not None: token[0]._registrar_span(token[1], time.perf_counter() - token[2])
+
+    def _registrar_span(self, nome, duracao):
+        with self._trava:
+            atual = self.spans.setdefault(nome, {"chamadas": 0, "total_s": 0.0, "max_s": 0.0})
+            atual["chamadas"] += 1
+            atual["total_s"] += duracao
+            atual["max_s"] = max(atual["max_s"], duracao)
+
+    # --- CONTADORES E EXCEÇÕES ---
+    def contar(self, nome, quantidade=1):
+        alvo = self._alvo()
+        if not alvo.ativo: return
+        with alvo._trava: alvo.contadores[nome] = alvo.contadores.get(nome, 0) + quantidade
+
+    def excecao(self, local, erro):
+        """Registra uma exceção tratada silenciosamente. Sempre ativo: só custa no caminho de erro."""
+        alvo = self._alvo()
+        with alvo._trava:
+            atual = alvo.excecoes.setdefault(local, {"quantidade": 0, "ultima": ""})
+            atual["quantidade"] += 1
+            atual["ultima"] = f"{type(erro).__name__}: {erro}"
+
+    def mesclar(self, resumo):
+        """Soma o resumo de outro registro ou processo (ex.: de um worker do backtest paralelo) à execução em curso."""
+        self._alvo()._somar(resumo)
+
+    def _somar(self, resumo):
+        with self._trava:
+            for nome, v in resumo.get("spans", {}).items():
+                atual = self.spans.setdefault(nome, {"chamadas": 0, "total_s": 0.0, "max_s": 0.0})
+                atual["chamadas"] += v["chamadas"]
+                atual["total_s"] += v["total_s"]
+                atual["max_s"] = max(atual["max_s"], v["max_s"])
+            for nome, quantidade in resumo.get("contadores", {}).items(): self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+            for local, v in resumo.get("excecoes", {}).items():
+                atual = self.excecoes.setdefault(local, {"quantidade": 0, "ultima": ""})
+                atual["quantidade"] += v["quantidade"]
+                atual["ultima"] = v["ultima"]
+
+    # --- SAÍDA ---
+    def resumo(self):
+        with self._trava:
+            spans = {nome: dict(v, media_s=v["total_s"] / v["chamadas"]) for nome, v in self.spans.items()}
+            return {"execucao": dict(self.execucao), "ativo": self.ativo, "spans": spans,
+                    "contadores": dict(self.contadores), "excecoes": {k: dict(v) for k, v in self.excecoes.items()}}
+
+    def exportar_json(self):
+        return json.dumps(self.resumo(), indent=2, ensure_ascii=False)
+
+INSTRUMENTACAO = Instrumentacao(ativo=os.environ.get("FRACTALV_PERF") == "1")
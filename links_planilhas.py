@@ -29,3 +29,18 @@ PARAMS_LEITURA = {
     "thousands": ".",    # Tratamento para números brasileiros (milhar)
     "decimal": ","       # Tratamento para números brasileiros (decimal)
 }
+
+# Jogos exibidos no painel e processados pela rotina (ordem dos cartões)
+JOGOS_LISTA = ["MEGA_SENA", "LOTOFACIL", "QUINA", "LOTOMANIA", "TIMEMANIA", "DIA_DE_SORTE", "DUPLA_SENA"]
+
+# Formato de cada jogo: dezenas sorteadas, tamanho do universo, primeira dezena,
+# faixa de dezenas por aposta e preço da aposta mínima (R$)
+FORMATOS_JOGOS = {
+    "MEGA_SENA":    {"sorteadas": 6,  "universo": 60,  "inicio": 1, "aposta_min": 6,  "aposta_max": 20, "preco_base": 5.00},
+    "LOTOFACIL":    {"sorteadas": 15, "universo": 25,  "inicio": 1, "aposta_min": 15, "aposta_max": 20, "preco_base": 3.00},
+    "QUINA":        {"sorteadas": 5,  "universo": 80,  "inicio": 1, "aposta_min": 5,  "aposta_max": 15, "preco_base": 2.50},
+    "LOTOMANIA":    {"sorteadas": 20, "universo": 100, "inicio": 0, "aposta_min": 50, "aposta_max": 50, "preco_base": 3.00},
+    "TIMEMANIA":    {"sorteadas": 7,  "universo": 80,  "inicio": 1, "aposta_min": 10, "aposta_max": 10, "preco_base": 3.50},
+    "DIA_DE_SORTE": {"sorteadas": 7,  "universo": 31,  "inicio": 1, "aposta_min": 7,  "aposta_max": 15, "preco_base": 2.50},
+    "DUPLA_SENA":   {"sorteadas": 6,  "universo": 50,  "inicio": 1, "aposta_min": 6,  "aposta_max": 15, "preco_base": 2.50},
+}
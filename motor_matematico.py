@@ -1,215 +1,955 @@
+import hashlib
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from instrumentacao import INSTRUMENTACAO
+
+def _chave_loteria(nome):
+    return str(nome).upper().strip().replace(' ', '_').replace('-', '_').replace('Á', 'A')
 
 class OtimizadorFinanceiro:
     def __init__(self, link_csv_valores):
         self.url = link_csv_valores
         self.df_precos = None
+        self.indice = {}
+        self._resolvidas = {}
 
-    def carregar_dados(self):
+    def carregar_dados(self, tabela=None):
         try:
-            self.df_precos = pd.read_csv(self.url, decimal=",", thousands=".", on_bad_lines='skip')
+            self.df_precos = pd.read_csv(self.url, decimal=",", thousands=".", on_bad_lines='skip') if tabela is None else tabela.copy()
             self.df_precos.dropna(subset=['Loteria'], inplace=True)
             if 'Preço Total (R$)' in self.df_precos.columns:
                 self.df_precos['Preço Total (R$)'] = self.df_precos['Preço Total (R$)'].astype(str).apply(
                     lambda x: float(x.replace('R$', '').replace('.', '').replace(',', '.').strip()) if isinstance(x, str) else x
                 )
-            self.df_precos['Loteria_Key'] = self.df_precos['Loteria'].astype(str).str.upper().str.replace(' ', '_').str.replace('Á', 'A')
+            self.df_precos['Loteria_Key'] = self.df_precos['Loteria'].map(_chave_loteria)
+            self._indexar()
             return True
-        except: return False
+        except Exception as e:
+            INSTRUMENTACAO.excecao("orcamento.carregar_dados", e)
+            return False
+
+    # --- ÍNDICE DE PREÇOS ---
+    def _indexar(self):
+        """Uma vez por carga da tabela: {jogo: dezenas, preços e centavos}, em ordem crescente de preço."""
+        precos = pd.to_numeric(self.df_precos['Preço Total (R$)'], errors='coerce')
+        dezenas = pd.to_numeric(self.df_precos['Qtd. Dezenas'], errors='coerce')
+        tabela = pd.DataFrame({"chave": self.df_precos['Loteria_Key'], "dezenas": dezenas, "preco": precos}).dropna()
+        tabela = tabela[tabela["preco"] > 0]
+        self.indice, self._resolvidas = {}, {}
+        for chave, grupo in tabela.groupby("chave", sort=False):
+            grupo = grupo.sort_values("preco", kind="stable")
+            self.indice[chave] = {
+                "dezenas": grupo["dezenas"].to_numpy(dtype=np.int64),
+                "precos": grupo["preco"].to_numpy(dtype=float),
+                "centavos": np.rint(grupo["preco"].to_numpy(dtype=float) * 100).astype(np.int64),
+            }
+
+    def _entrada(self, jogo):
+        """Chave exata; se a planilha usar outro nome (ex.: 'MEGA_SENA_ESPECIAL'), a primeira que contém a chave."""
+        if self.df_precos is None and not self.carregar_dados(): return None
+        jogo_key = _chave_loteria(jogo)
+        if jogo_key not in self._resolvidas:
+            self._resolvidas[jogo_key] = jogo_key if jogo_key in self.indice else next((k for k in self.indice if jogo_key in k), None)
+        chave = self._resolvidas[jogo_key]
+        return self.indice[chave] if chave is not None else None
 
     def obter_preco_minimo(self, jogo):
-        if self.df_precos is None:
-            if not self.carregar_dados(): return 5.0
-        try:
-            jogo_key = str(jogo).upper().replace(' ', '_')
-            tabela = self.df_precos[self.df_precos['Loteria_Key'].str.contains(jogo_key, na=False)]
-            if tabela.empty: return 5.0
-            return float(tabela['Preço Total (R$)'].min())
-        except: return 5.0
+        entrada = self._entrada(jogo)
+        return float(entrada["precos"][0]) if entrada is not None else 5.0
 
-    def calcular_melhor_estrategia(self, jogo, orcamento, modo="POTENCIA"):
+    def calcular_melhor_estrategia(self, jogo, orcamento, modo="POTENCIA", criterio="GASTO"):
         """
-        modo: "POTENCIA" (Foco em desdobramento) ou "EQUILIBRIO" (Misto)
+        modo: "POTENCIA" (Foco em desdobramento), "EQUILIBRIO" (Misto) ou
+        "OTIMO" (mochila exata: nenhum carrinho gasta mais do orçamento, ver criterio)
         """
         if self.df_precos is None:
             if not self.carregar_dados(): return {"erro": "Erro crítico: Tabela indisponível."}
-
-        jogo_key = str(jogo).upper().replace(' ', '_')
-        tabela = self.df_precos[self.df_precos['Loteria_Key'].str.contains(jogo_key, na=False)].copy()
-        if tabela.empty: return {"erro": f"Jogo '{jogo}' não encontrado."}
+        entrada = self._entrada(jogo)
+        if entrada is None: return {"erro": f"Jogo '{jogo}' não encontrado."}
+        if modo == "OTIMO": return self.curva_orcamento(jogo, [orcamento], criterio)[0]
 
         estrategia = {"jogo": jogo, "orcamento_inicial": orcamento, "carrinho": [], "sobra": 0}
-        
+        dezenas, precos = entrada["dezenas"], entrada["precos"]
+
         # --- LÓGICA DE EQUILÍBRIO (HÍBRIDA) ---
         if modo == "EQUILIBRIO":
             # 60% para Potência, 40% para Volume
             orcamento_power = orcamento * 0.60
             saldo_atual = orcamento
-            
-            # FASE 1: Potência (Jogo Forte)
-            tabela_power = tabela.sort_values(by='Preço Total (R$)', ascending=False)
-            for _, row in tabela_power.iterrows():
-                custo = float(row['Preço Total (R$)'])
-                if custo <= 0: continue
-                
-                if orcamento_power >= custo:
-                    qtd = int(orcamento_power // custo)
-                    if qtd > 0:
-                        qtd = max(1, qtd)
-                        dezenas_val = int(float(row['Qtd. Dezenas']))
-                        estrategia['carrinho'].append({"qtd_volantes": qtd, "dezenas": dezenas_val, "custo_total": qtd * custo})
-                        saldo_atual -= (qtd * custo)
-                        break 
-            
+
+            # FASE 1: Potência (Jogo Forte): a aposta mais cara que cabe em 60%
+            cabem = np.flatnonzero(precos <= orcamento_power)
+            if len(cabem):
+                i = cabem[-1]
+                qtd = int(orcamento_power // precos[i])
+                estrategia['carrinho'].append({"qtd_volantes": qtd, "dezenas": int(dezenas[i]), "custo_total": qtd * float(precos[i])})
+                saldo_atual -= qtd * float(precos[i])
+
             # FASE 2: Volume com o troco (Jogos Baratos)
-            tabela_cob = tabela.sort_values(by='Preço Total (R$)', ascending=True)
-            try:
-                row = tabela_cob.iloc[0]
-                custo = float(row['Preço Total (R$)'])
-                dezenas_val = int(float(row['Qtd. Dezenas']))
-                
-                if saldo_atual >= custo:
-                    qtd = int(saldo_atual // custo)
-                    if qtd > 0:
-                        estrategia['carrinho'].append({
-                            "qtd_volantes": qtd, 
-                            "dezenas": dezenas_val, 
-                            "custo_total": qtd * custo
-                        })
-                        saldo_atual -= (qtd * custo)
-            except: pass
-            
+            if saldo_atual >= precos[0]:
+                qtd = int(saldo_atual // precos[0])
+                estrategia['carrinho'].append({"qtd_volantes": qtd, "dezenas": int(dezenas[0]), "custo_total": qtd * float(precos[0])})
+                saldo_atual -= qtd * float(precos[0])
+
             estrategia['sobra'] = round(saldo_atual, 2)
             return estrategia
 
         # --- LÓGICA DE POTÊNCIA (PADRÃO / ELSE) ---
         else:
-            tabela = tabela.sort_values(by='Preço Total (R$)', ascending=False)
             saldo = orcamento
-            for _, row in tabela.iterrows():
-                try:
-                    custo = float(row['Preço Total (R$)'])
-                    if custo <= 0: continue
-                    if saldo >= custo:
-                        qtd = int(saldo // custo)
-                        dezenas_val = int(float(row['Qtd. Dezenas']))
-                        estrategia['carrinho'].append({"qtd_volantes": qtd, "dezenas": dezenas_val, "custo_total": qtd * custo})
-                        saldo -= (qtd * custo)
-                except: continue
+            for i in range(len(precos) - 1, -1, -1):
+                if saldo >= precos[i]:
+                    qtd = int(saldo // precos[i])
+                    estrategia['carrinho'].append({"qtd_volantes": qtd, "dezenas": int(dezenas[i]), "custo_total": qtd * float(precos[i])})
+                    saldo -= qtd * float(precos[i])
             estrategia['sobra'] = round(saldo, 2)
             return estrategia
 
+    # --- MOCHILA EXATA ---
+    def curva_orcamento(self, jogo, orcamentos, criterio="GASTO"):
+        """
+        Resolve vários orçamentos com uma única mochila ilimitada (até o maior deles) e devolve
+        uma estratégia por orçamento, no mesmo formato de calcular_melhor_estrategia.
+        criterio: "GASTO" maximiza o valor gasto e desempata com menos volantes (apostas mais
+        fortes); "COBERTURA" maximiza as dezenas marcadas somadas e desempata pelo gasto.
+        """
+        entrada = self._entrada(jogo)
+        if entrada is None: return [{"erro": f"Jogo '{jogo}' não encontrado."} for _ in orcamentos]
+        with INSTRUMENTACAO.span("orcamento.mochila"):
+            # Tudo em unidades do MDC dos preços: a tabela de R$ 0,50 em R$ 0,50 vira poucas células
+            unidade = int(np.gcd.reduce(entrada["centavos"]))
+            pesos = entrada["centavos"] // unidade
+            limites = [max(0, int(round(o * 100, 6)) // unidade) for o in orcamentos]
+            capacidade = max(limites) if limites else 0
+            escala = capacidade + 1
+            if criterio == "COBERTURA": valores = entrada["dezenas"] * escala + pesos
+            else: valores = pesos * escala - 1
+
+            # Cada item vira cópias de 1, 2, 4, ... volantes (divisão binária), cada cópia um
+            # passo vetorizado de mochila 0/1 sobre todas as capacidades de uma vez.
+            melhor = np.zeros(capacidade + 1, dtype=np.int64)
+            passos = []
+            for item, peso in enumerate(pesos):
+                restante, copias = capacidade // int(peso), 1
+                while restante > 0:
+                    copias = min(copias, restante)
+                    p, v = int(peso) * copias, int(valores[item]) * copias
+                    candidato = melhor[:-p] + v
+                    escolha = np.zeros(capacidade + 1, dtype=bool)
+                    escolha[p:] = candidato > melhor[p:]
+                    melhor[p:] = np.where(escolha[p:], candidato, melhor[p:])
+                    passos.append((item, copias, p, escolha))
+                    restante -= copias
+                    copias *= 2
+
+        estrategias = []
+        for orcamento, limite in zip(orcamentos, limites):
+            volantes, c = np.zeros(len(pesos), dtype=np.int64), limite
+            for item, copias, p, escolha in reversed(passos):
+                if escolha[c]:
+                    volantes[item] += copias
+                    c -= p
+            carrinho = [{"qtd_volantes": int(volantes[i]), "dezenas": int(entrada["dezenas"][i]), "custo_total": int(volantes[i]) * float(entrada["precos"][i])}
+                        for i in range(len(pesos) - 1, -1, -1) if volantes[i]]
+            gasto = sum(x["custo_total"] for x in carrinho)
+            estrategias.append({"jogo": jogo, "orcamento_inicial": orcamento, "carrinho": carrinho, "sobra": round(orcamento - gasto, 2)})
+        return estrategias
+
+class MatrizSorteios:
+    """
+    Representação compacta da história (DrawMatrix), montada uma única vez por jogo.
+    Linhas seguem a ordem do df (mais novo primeiro). Guarda as dezenas em uint8 e uma
+    máscara de bits por sorteio (Lotomania usa as posições 0-100), de modo que interseções
+    (acertos do backtest, linha de base aleatória, cobertura) viram popcount; o one-hot é expandido sob demanda, só para a janela usada.
+    """
+    def __init__(self, df, cols, loteria=None, concursos=None):
+        bruto = df[cols].to_numpy(dtype=float)
+        valido = ~np.isnan(bruto) & (bruto >= 0) & (bruto < 256)
+        self._montar(np.where(valido, bruto, 0).astype(np.uint8), valido, cols, loteria, concursos)
+
+    @classmethod
+    def de_arrays(cls, dezenas, valido, cols, loteria=None, concursos=None):
+        """Monta a matriz direto dos arrays já convertidos (ex.: cache local da ingestão)."""
+        matriz = cls.__new__(cls)
+        matriz._montar(np.asarray(dezenas, dtype=np.uint8), np.asarray(valido, dtype=bool), cols, loteria, concursos)
+        return matriz
+
+    def _montar(self, dezenas, valido, cols, loteria, concursos):
+        self.cols = list(cols)
+        self.loteria = loteria
+        self.concursos = None if concursos is None else np.asarray(concursos, dtype=np.int32)
+        self._impressao, self._prefixos, self._atributos = None, None, None
+        self.n, self.k = dezenas.shape
+        self.valido = valido
+        self.dezenas = np.where(valido, dezenas, 0).astype(np.uint8)
+        self.somas = self.dezenas.sum(axis=1, dtype=np.int32)
+        self.universo = int(self.dezenas.max()) + 1 if self.n else 1
+        linhas, colunas = np.nonzero(self.valido)
+        self.palavras = -(-self.universo // 64)
+        self.bits = np.zeros((self.n, self.palavras), dtype=np.uint64)
+        valores = self.dezenas[linhas, colunas].astype(np.uint64)
+        np.bitwise_or.at(self.bits, (linhas, (valores // 64).astype(np.intp)), np.uint64(1) << (valores % 64))
+        # Linhas completas (equivalente ao dropna usado pela IA)
+        self.idx_completos = np.flatnonzero(self.valido.all(axis=1)).astype(np.int32)
+
+    @classmethod
+    def garantir(cls, dados, cols=None):
+        return dados if isinstance(dados, cls) else cls(dados, cols)
+
+    def __len__(self): return self.n
+
+    @property
+    def impressao(self):
+        """Impressão digital do conteúdo (muda quando entra um sorteio novo ou a base é corrigida)."""
+        if self._impressao is None:
+            h = hashlib.blake2b(digest_size=16)
+            for a in (self.dezenas, self.valido): h.update(np.ascontiguousarray(a).tobytes())
+            self._impressao = h.hexdigest()
+        return self._impressao
+
+    def impressoes_historico(self):
+        """
+        Impressão encadeada de cada linha: resume o sorteio e toda a história anterior a ele, logo
+        identifica uma dobra do backtest (alvo + treino) mesmo depois que entram sorteios novos.
+        """
+        if self._prefixos is None:
+            prefixos, anterior = [None] * self.n, b""
+            for i in range(self.n - 1, -1, -1):
+                anterior = hashlib.blake2b(anterior + self.dezenas[i].tobytes() + self.valido[i].tobytes(), digest_size=16).digest()
+                prefixos[i] = anterior.hex()
+            self._prefixos = prefixos
+        return self._prefixos
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.dezenas, self.valido, self.somas, self.bits, self.idx_completos)) + (self.concursos.nbytes if self.concursos is not None else 0)
+
+    def linha(self, i):
+        return self.dezenas[i][self.valido[i]].astype(np.int64)
+
+    def janela(self, inicio, tamanho):
+        return slice(inicio, min(inicio + tamanho, self.n))
+
+    def onehot(self, linhas):
+        """Expande as máscaras de bits das linhas pedidas em uma matriz 0/1 (linhas x universo)."""
+        bloco = np.atleast_2d(self.bits[linhas])
+        return np.unpackbits(bloco.view(np.uint8), axis=1, count=self.universo, bitorder='little')
+
+    def completos_cronologico(self):
+        return self.dezenas[self.idx_completos[::-1]].astype(np.int64)
+
+    def frequencia(self, inicio=0, tamanho=50):
+        return self.onehot(self.janela(inicio, tamanho)).sum(axis=0, dtype=np.int64)
+
+    def mascaras(self, bilhetes):
+        """Máscaras de bits (bilhetes x palavras) no formato de self.bits; -1 e dezenas fora do universo não entram."""
+        mascaras = np.zeros((len(bilhetes), self.palavras), dtype=np.uint64)
+        for linha, bilhete in enumerate(bilhetes):
+            valores = np.asarray(bilhete, dtype=np.int64)
+            valores = valores[(valores >= 0) & (valores < 64 * self.palavras)].astype(np.uint64)
+            np.bitwise_or.at(mascaras[linha], (valores // 64).astype(np.intp), np.uint64(1) << (valores % 64))
+        return mascaras
+
+    def intersecoes(self, i, mascaras):
+        """Dezenas em comum entre o sorteio i e cada máscara (ex.: os bilhetes dos modelos numa dobra)."""
+        return _popcount(np.atleast_2d(mascaras) & self.bits[i]).sum(axis=1)
+
+    def ocorrencias(self, linhas):
+        """Dezenas das linhas informadas, achatadas na ordem do df (como o value_counts via)."""
+        return self.dezenas[linhas][self.valido[linhas]].astype(np.int64)
+
+    def ranking_frequencia(self, inicio=0, tamanho=50):
+        return _ranking_ocorrencias(self.ocorrencias(self.janela(inicio, tamanho)))
+
+    def atributos(self):
+        """Feature store no sorteio mais recente, montada uma vez por matriz (só leitura: não reposicionar)."""
+        if self._atributos is None: self._atributos = AtributosDezenas(self, 0)
+        return self._atributos
+
+    def serie_frequencia(self, inicio=0, tamanho=50):
+        if inicio == 0:
+            contagens = self.atributos().frequencia(tamanho)
+            ranking = self.atributos().ranking(tamanho)
+        else:
+            contagens = self.frequencia(inicio, tamanho)
+            ranking = self.ranking_frequencia(inicio, tamanho)
+        return pd.Series(contagens[ranking].astype(np.int32), index=pd.Index(ranking, dtype=np.int16))
+
+def _popcount(arr):
+    if hasattr(np, 'bitwise_count'): return np.bitwise_count(arr)
+    por_byte = np.unpackbits(np.ascontiguousarray(arr).view(np.uint8)[..., None], axis=-1).sum(axis=-1)
+    return por_byte.reshape(arr.shape + (8,)).sum(axis=-1)
+
+def _ordenar(contagens, desempate):
+    presentes = np.flatnonzero(contagens > 0)
+    return presentes[np.lexsort((desempate[presentes], -contagens[presentes]))].tolist()
+
+def _ranking_ocorrencias(valores):
+    """Mesma ordem do value_counts: contagem decrescente, empates pela primeira ocorrência."""
+    unicos, primeira, contagens = np.unique(valores, return_index=True, return_counts=True)
+    return unicos[np.lexsort((primeira, -contagens))].tolist()
+
+class AtributosDezenas:
+    """
+    Feature store por dezena no cursor (linha mais recente visível): frequência em várias
+    janelas, atraso desde a última aparição, sequência de aparições seguidas e coocorrência
+    de pares numa janela. Ao incorporar o sorteio seguinte (cursor - 1) tudo é atualizado em
+    O(universo); qualquer outro cursor é reconstruído por produto de one-hots. Os modelos leem
+    daqui a frequência e o desempate do ranking em vez de recontar a janela.
+    """
+    JANELAS = (10, 50, 100)
+
+    def __init__(self, matriz, cursor=0, janelas=JANELAS, janela_pares=100):
+        self.m = matriz
+        self.janelas = tuple(sorted(set(janelas)))
+        self.janela_pares = janela_pares
+        self.cursor = None
+        if cursor is not None: self.posicionar(cursor)
+
+    def reconstruir(self, cursor):
+        m = self.m
+        self.frequencias = {w: m.frequencia(cursor, w).astype(np.int32) for w in self.janelas}
+        sufixo = m.onehot(slice(cursor, m.n)).astype(bool)
+        # Desempate do value_counts = posição da aparição mais recente (linha * k + coluna); dele sai o atraso
+        self.desempate = np.full(m.universo, np.iinfo(np.int64).max, dtype=np.int64)
+        dezenas = np.flatnonzero(sufixo.any(axis=0))
+        if len(dezenas):
+            linhas = cursor + sufixo[:, dezenas].argmax(axis=0)
+            colunas = ((m.dezenas[linhas] == dezenas[:, None]) & m.valido[linhas]).argmax(axis=1)
+            self.desempate[dezenas] = linhas.astype(np.int64) * m.k + colunas
+        # História vazia (planilha só com cabeçalho, ou cursor no fim): nada visto, nenhuma sequência
+        if len(sufixo) == 0: self.sequencia = np.zeros(m.universo, dtype=np.int32)
+        else: self.sequencia = np.where(sufixo.all(axis=0), len(sufixo), (~sufixo).argmax(axis=0)).astype(np.int32)
+        if self.janela_pares:
+            oh = m.onehot(m.janela(cursor, self.janela_pares)).astype(np.int32)
+            self.pares = oh.T @ oh
+        self.cursor = cursor
+
+    def avancar(self):
+        """Incorpora o sorteio da linha cursor-1 e descarta de cada janela a linha que saiu."""
+        m, c = self.m, self.cursor - 1
+        linha = m.onehot(c)[0]
+        for w, contagens in self.frequencias.items():
+            contagens += linha
+            if c + w < m.n: contagens -= m.onehot(c + w)[0]
+        colunas = np.flatnonzero(m.valido[c])[::-1]
+        self.desempate[m.dezenas[c, colunas]] = c * m.k + colunas
+        self.sequencia += 1
+        self.sequencia *= linha
+        if self.janela_pares:
+            novas = np.flatnonzero(linha)
+            self.pares[np.ix_(novas, novas)] += 1
+            if c + self.janela_pares < m.n:
+                velhas = np.flatnonzero(m.onehot(c + self.janela_pares)[0])
+                self.pares[np.ix_(velhas, velhas)] -= 1
+        self.cursor = c
+
+    def posicionar(self, cursor):
+        if self.cursor is not None and cursor == self.cursor - 1: self.avancar()
+        elif cursor != self.cursor: self.reconstruir(cursor)
+
+    # --- LEITURA ---
+    def frequencia(self, janela=50):
+        if janela in self.frequencias: return self.frequencias[janela]
+        return self.m.frequencia(self.cursor, janela)
+
+    def atraso(self):
+        """Sorteios desde a última aparição (0 = saiu no cursor); nunca vista = história inteira."""
+        vista = self.desempate < np.iinfo(np.int64).max
+        return np.where(vista, np.where(vista, self.desempate, 0) // self.m.k - self.cursor, self.m.n - self.cursor)
+
+    def ranking(self, janela=50):
+        return _ordenar(self.frequencia(janela), self.desempate)
+
+    def parceiras(self):
+        """Dezena que mais saiu junto de cada uma na janela de pares (-1 se nenhuma)."""
+        if not self.janela_pares: return np.full(self.m.universo, -1)
+        fora = self.pares.copy()
+        np.fill_diagonal(fora, 0)
+        return np.where(fora.max(axis=1) > 0, fora.argmax(axis=1), -1)
+
+    def instantaneo(self):
+        """Cópia independente do estado no cursor atual (para guardar a foto de uma dobra)."""
+        foto = {"cursor": self.cursor, "atraso": self.atraso(), "sequencia": self.sequencia.copy(),
+                **{f"freq_{w}": c.copy() for w, c in self.frequencias.items()}}
+        if self.janela_pares: foto["pares"] = self.pares.copy()
+        return foto
+
+class MatrizTransicao:
+    """
+    Cadeia de Markov dezena→dezena. T[a, b] acumula quantas vezes a dezena b saiu no sorteio
+    seguinte a um sorteio que continha a, com decaimento geométrico opcional e janela
+    opcional (None = história inteira). Montada por produto de matrizes one-hot e atualizada
+    em O(universo²) quando o cursor avança um sorteio.
+    """
+    def __init__(self, matriz, cursor=0, janela=None, decaimento=1.0):
+        self.m, self.janela, self.decaimento = matriz, janela, decaimento
+        self.reconstruir(cursor)
+
+    def reconstruir(self, cursor):
+        fim = self.m.n if self.janela is None else min(self.m.n, cursor + self.janela + 1)
+        oh = self.m.onehot(slice(cursor, fim)).astype(np.float64)
+        pesos = self.decaimento ** np.arange(max(len(oh) - 1, 0))
+        origem = oh[1:] * pesos[:, None]
+        self.T = origem.T @ oh[:-1]
+        self.origens = origem.sum(axis=0)
+        self.cursor = cursor
+
+    def registrar(self, origem, destino, peso=1.0):
+        self.T += peso * np.outer(origem, destino)
+        self.origens += peso * origem
+
+    def avancar(self):
+        """Incorpora o sorteio da linha cursor-1 como novo estado (e descarta o que saiu da janela)."""
+        c = self.cursor - 1
+        self.T *= self.decaimento
+        self.origens *= self.decaimento
+        # Vindo do estado vazio (cursor no fim da história), o primeiro sorteio ainda não tem origem
+        if c + 1 < self.m.n: self.registrar(self.m.onehot(c + 1)[0], self.m.onehot(c)[0])
+        if self.janela is not None and c + self.janela + 1 < self.m.n:
+            velha = c + self.janela
+            self.registrar(self.m.onehot(velha + 1)[0], self.m.onehot(velha)[0], -(self.decaimento ** self.janela))
+        self.cursor = c
+
+    def posicionar(self, cursor):
+        if cursor == self.cursor - 1: self.avancar()
+        elif cursor != self.cursor: self.reconstruir(cursor)
+
+    def pontuar(self):
+        """Probabilidade acumulada de cada dezena no próximo sorteio dado o estado atual."""
+        estado = self.m.onehot(self.cursor)[0] / np.maximum(self.origens, 1e-12)
+        return estado @ self.T
+
+class BacktestIncremental:
+    """
+    Motor walk-forward do backtest sobre a MatrizSorteios. O cursor aponta para a linha
+    mais recente visível ao modelo e, ao avançar uma dobra, as frequências da janela são
+    atualizadas somando o sorteio que entra e subtraindo o que sai.
+    """
+    MODELOS = {"IA (Random Forest)": "IA", "Hurst (Fractal)": "Hurst", "Markov (Cadeias)": "Markov", "Gauss (Normal)": "Gauss"}
+    # Parâmetros de uma "versão" do motor (ver varredura.py); os padrões são a versão original
+    PARAMETROS = {"janela_freq": 50, "janela_markov": 100, "decaimento_markov": 1.0, "janela_ia": 5, "arvores_ia": 50,
+                  "escalas_fractal": None, "fator_pool": 3, "pool_minimo": 40, "elite_extra": 10}
+    # Versão do código de pontuação: incrementar sempre que um modelo passar a pontuar diferente com
+    # os mesmos parâmetros, senão o ArmazemDobras continua servindo as dobras antigas
+    VERSAO = 1
+
+    def __init__(self, matriz, janela_freq=50, janela_markov=100, janela_ia=5, escalas_fractal=None,
+                 decaimento_markov=1.0, arvores_ia=50, fator_pool=3, pool_minimo=40, elite_extra=10, atributos=None):
+        self.m = matriz
+        # atributos: store já posicionada e compartilhada (ex.: matriz.atributos() para o cursor 0); senão, uma própria
+        self.atributos = atributos or AtributosDezenas(matriz, None, (janela_freq,), janela_pares=None)
+        self.janela_freq, self.janela_markov, self.janela_ia = janela_freq, janela_markov, janela_ia
+        self.escalas_fractal = escalas_fractal
+        self.decaimento_markov, self.arvores_ia = decaimento_markov, arvores_ia
+        self.fator_pool, self.pool_minimo, self.elite_extra = fator_pool, pool_minimo, elite_extra
+        self.modelo_ia, self.cursor_ia, self._cron = None, None, None
+        self.transicao, self.fractal = None, None
+
+    # --- ESTADO INCREMENTAL (AtributosDezenas) ---
+    @property
+    def cursor(self): return self.atributos.cursor
+
+    @property
+    def contagens(self): return self.atributos.frequencia(self.janela_freq)
+
+    def posicionar(self, cursor):
+        self.atributos.posicionar(cursor)
+
+    def ranking_frequencia(self, cursor):
+        self.posicionar(cursor)
+        return self.atributos.ranking(self.janela_freq)
+
+    def tamanho_pool(self, qtd_alvo):
+        return max(qtd_alvo * self.fator_pool, self.pool_minimo)
+
+    # --- MODELOS ---
+    def _ranking_ia(self, cursor, ranking_freq, qtd_pool, intervalo_ia=1):
+        m = int(np.count_nonzero(self.m.idx_completos >= cursor))
+        if m < 20: return ranking_freq
+        if self._cron is None: self._cron = self.m.completos_cronologico()
+        data, win, k = self._cron[:m], self.janela_ia, self.m.k
+        # A floresta é ajustada em posições cronológicas fixas (múltiplos de intervalo_ia), só com a
+        # história até ali: o resultado de uma dobra não depende de como as dobras foram divididas
+        # nem de sorteios novos, e o armazém pode reaproveitá-lo
+        posicao = self.m.n - cursor
+        cursor_ajuste = self.m.n - posicao // max(1, intervalo_ia) * max(1, intervalo_ia)
+        m_ajuste = int(np.count_nonzero(self.m.idx_completos >= cursor_ajuste))
+        if m_ajuste <= win: cursor_ajuste, m_ajuste = cursor, m
+        if self.modelo_ia is None or self.cursor_ia != cursor_ajuste:
+            treino = data[:m_ajuste]
+            janelas = np.lib.stride_tricks.sliding_window_view(treino, (win, k))[:m_ajuste - win, 0]
+            from sklearn.ensemble import RandomForestRegressor  # importado só quando a IA roda de fato
+            self.modelo_ia = RandomForestRegressor(n_estimators=self.arvores_ia, random_state=42)
+            self.modelo_ia.fit(janelas.reshape(m_ajuste - win, win * k), treino[win:m_ajuste])
+            self.cursor_ia = cursor_ajuste
+        pred = self.modelo_ia.predict(data[m - win:m].reshape(1, -1))[0]
+        scores = {}
+        for val in pred:
+            n = int(round(val))
+            if n > 0: scores[n] = scores.get(n, 0) + 1
+        ranking_ia = sorted(scores.keys(), key=lambda x: scores[x], reverse=True)
+        ranking_ia += [n for n in ranking_freq if n not in scores]
+        return ranking_ia[:qtd_pool]
+
+    def _ranking_hurst(self, cursor, ranking_freq, qtd_pool):
+        if self.fractal is None: self.fractal = MotorFractal(self.m, cursor, self.escalas_fractal)
+        else: self.fractal.posicionar(cursor)
+        if not ranking_freq: return ranking_freq
+        scores = self.fractal.pontuar(self.contagens if self.cursor == cursor else self.m.frequencia(cursor, self.janela_freq))
+        candidatos = np.array(ranking_freq)
+        ordem = np.lexsort((np.arange(len(candidatos)), -np.nan_to_num(scores[candidatos])))
+        return candidatos[ordem].tolist()[:qtd_pool]
+
+    def _ranking_markov(self, cursor, ranking_freq, qtd_pool):
+        if self.m.n - cursor < 2: return ranking_freq[:qtd_pool]
+        if self.transicao is None: self.transicao = MatrizTransicao(self.m, cursor, janela=self.janela_markov, decaimento=self.decaimento_markov)
+        else: self.transicao.posicionar(cursor)
+        scores = self.transicao.pontuar()
+        posicao = np.full(self.m.universo, len(ranking_freq))
+        posicao[ranking_freq] = np.arange(len(ranking_freq))
+        presentes = np.flatnonzero(scores > 1e-9)
+        ranking_mk = presentes[np.lexsort((posicao[presentes], -scores[presentes]))].tolist()
+        vistos = set(ranking_mk)
+        return (ranking_mk + [x for x in ranking_freq if x not in vistos])[:qtd_pool]
+
+    def ranking(self, tipo, cursor, qtd_pool, ranking_freq=None, intervalo_ia=1):
+        if ranking_freq is None: ranking_freq = self.ranking_frequencia(cursor)
+        with INSTRUMENTACAO.span(f"ranking.{tipo}"):
+            if tipo == "IA":
+                try: return self._ranking_ia(cursor, ranking_freq, qtd_pool, intervalo_ia)
+                except Exception as e:
+                    INSTRUMENTACAO.excecao("ranking.IA", e)
+                    return ranking_freq
+            elif tipo == "Hurst": return self._ranking_hurst(cursor, ranking_freq, qtd_pool)
+            elif tipo == "Markov": return self._ranking_markov(cursor, ranking_freq, qtd_pool)
+            return ranking_freq[:qtd_pool]
+
+    @staticmethod
+    def selecionar(ranking, ranking_freq, qtd_alvo, fixos, excluidos, seed_val, elite_extra=10):
+        vagas = qtd_alvo - len(fixos)
+        if vagas <= 0: return sorted(list(set(fixos))[:qtd_alvo])
+        candidatos = [n for n in ranking if n not in excluidos and n not in fixos]
+        try:
+            rng = np.random.default_rng(seed_val)
+            corte_elite = min(len(candidatos), vagas + elite_extra)
+            # Menos candidatos que vagas é o caminho normal de pool pequeno (não é falha): entram
+            # todos e a frequência completa o resto logo abaixo
+            if corte_elite < vagas: escolhidos = candidatos
+            else: escolhidos = list(rng.choice(candidatos[:corte_elite], size=vagas, replace=False))
+        except Exception as e:
+            INSTRUMENTACAO.excecao("selecao.elite", e)
+            escolhidos = candidatos[:vagas]
+        if len(escolhidos) < vagas:
+            extras = [n for n in ranking_freq if n not in excluidos and n not in fixos and n not in escolhidos]
+            escolhidos.extend(extras[:vagas - len(escolhidos)])
+        return sorted(set(int(n) for n in escolhidos + list(fixos)))
+
+    @staticmethod
+    def selecionar_lote(ranking, ranking_freq, qtd_alvo, fixos, excluidos, sementes, elite_extra=10):
+        """
+        selecionar() para várias sementes de uma vez: os candidatos são filtrados uma única vez
+        e cada bilhete só custa o sorteio da própria semente (mesmos bilhetes, um por linha).
+        Devolve (len(sementes) x qtd_alvo) em int16, completado com -1 se faltar candidato.
+        """
+        saida = np.full((len(sementes), max(qtd_alvo, 0)), -1, dtype=np.int16)
+        vagas = qtd_alvo - len(fixos)
+        if vagas <= 0:
+            base = sorted(list(set(fixos))[:qtd_alvo])
+            saida[:, :len(base)] = base
+            return saida
+        bloqueados = set(excluidos) | set(fixos)
+        candidatos = np.array([n for n in ranking if n not in bloqueados], dtype=np.int64)
+        elite = candidatos[:min(len(candidatos), vagas + elite_extra)]
+        if len(elite) < vagas:
+            escolhidos = candidatos[:vagas].tolist()
+            extras = [n for n in ranking_freq if n not in bloqueados and n not in escolhidos]
+            linha = sorted(set(int(n) for n in escolhidos + extras[:vagas - len(escolhidos)] + list(fixos)))
+            saida[:, :len(linha)] = linha
+            return saida
+        fixos_arr = np.array(sorted(set(int(n) for n in fixos)), dtype=np.int64)
+        for j, semente in enumerate(sementes):
+            linha = np.union1d(np.random.default_rng(semente).choice(elite, size=vagas, replace=False), fixos_arr)
+            saida[j, :len(linha)] = linha
+        return saida
+
+    def pontuar_dobra(self, i, nomes=None, intervalo_ia=1):
+        """Acertos de cada modelo na dobra i (alvo = linha i, treino = linhas i+1 em diante)."""
+        qtd = int(_popcount(self.m.bits[i]).sum())
+        cursor = i + 1
+        ranking_freq = self.ranking_frequencia(cursor)
+        # Semente pela posição cronológica do alvo (não pelo índice da dobra), para que o resultado
+        # de uma dobra não mude quando entram sorteios novos e possa ficar no ArmazemDobras
+        seed_val = int(self.m.somas[cursor]) + ((self.m.n - 1 - i) * 9999)
+        bilhetes = {}
+        for nome in (nomes or self.MODELOS):
+            ranking = self.ranking(self.MODELOS[nome], cursor, self.tamanho_pool(qtd), ranking_freq, intervalo_ia)
+            bilhetes[nome] = self.selecionar(ranking, ranking_freq, qtd, [], [], seed_val, self.elite_extra)
+        # Acertos de todos os modelos num popcount só contra a máscara do sorteio-alvo
+        acertos = self.m.intersecoes(i, self.m.mascaras(list(bilhetes.values())))
+        return {nome: int(a) for nome, a in zip(bilhetes, acertos)}
+
+    def avaliar(self, dobras, nomes=None, intervalo_ia=1):
+        """Percorre as dobras do passado para o presente e devolve {dobra: {modelo: acertos}}."""
+        return {i: self.pontuar_dobra(i, nomes, intervalo_ia) for i in sorted(dobras, reverse=True)}
+
+    @classmethod
+    def resumir(cls, acertos_por_dobra):
+        placar = {nome: 0 for nome in cls.MODELOS}
+        for acertos in acertos_por_dobra.values():
+            for nome, valor in acertos.items(): placar[nome] += valor
+        melhor = max(placar, key=placar.get)
+        return melhor, placar[melhor], placar
+
+    def executar(self, profundidade=12, intervalo_ia=1):
+        """
+        Percorre as dobras do passado para o presente. intervalo_ia > 1 reaproveita a floresta
+        ajustada numa dobra anterior (sem vazamento de futuro) para viabilizar centenas de dobras
+        (MotorInferencia.intervalo_ia_padrao escolhe o valor pela profundidade).
+        """
+        return self.resumir(self.avaliar(range(profundidade), intervalo_ia=intervalo_ia))
+
+class CacheRanking:
+    """
+    Cache LRU de rankings por (loteria, modelo, impressão dos dados, janela). O ranking não
+    depende da semente, então um carrinho inteiro reaproveita um único ajuste do modelo.
+    """
+    def __init__(self, capacidade=32):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.acertos, self.faltas = 0, 0
+        self._trava = threading.Lock()
+
+    def obter(self, chave, calcular):
+        with self._trava:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                self.acertos += 1
+                INSTRUMENTACAO.contar("cache_ranking.acerto")
+                return self.itens[chave]
+            self.faltas += 1
+            INSTRUMENTACAO.contar("cache_ranking.falta")
+        valor = calcular()
+        with self._trava:
+            self.itens[chave] = valor
+            if len(self.itens) > self.capacidade: self.itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._trava: self.itens.clear()
+
+CACHE_RANKING = CacheRanking()
+
+class GeradorCobertura:
+    """
+    Monta o carrinho inteiro de uma vez sobre o pool de elite, em vez de sortear cada bilhete
+    isoladamente. Cada bilhete escolhe, dezena a dezena, a menos usada até agora e que menos
+    repete pares com as já escolhidas nele: equilibrar o uso minimiza a soma das
+    sobreposições entre bilhetes e espalhar os pares aproxima uma roda (wheel). Os bilhetes
+    ficam como máscaras de bits, então repetição e sobreposição máxima contra o carrinho
+    inteiro custam um popcount vetorizado por bilhete.
+    """
+    def __init__(self, elite, vagas, fixos=(), semente=0, limite_sobreposicao=None, tentativas=8):
+        self.elite = np.asarray(elite, dtype=np.int64)
+        self.vagas = int(vagas)
+        self.fixos = np.array(sorted(set(int(n) for n in fixos)), dtype=np.int64)
+        self.rng = np.random.default_rng(semente)
+        self.limite = limite_sobreposicao
+        self.tentativas = tentativas
+        tamanho = len(self.elite)
+        self.uso = np.zeros(tamanho)
+        self.pares = np.zeros((tamanho, tamanho))
+        self.palavras = -(-tamanho // 64)
+
+    def _montar(self, agitacao=1.0):
+        """Índices (no pool) de um bilhete, pela regra gulosa; agitacao aumenta o desempate aleatório nas novas tentativas."""
+        base = self.uso + self.rng.random(len(self.elite)) * agitacao
+        acumulado = np.zeros(len(self.elite))
+        escolhidos = np.empty(self.vagas, dtype=np.int64)
+        for j in range(self.vagas):
+            escolhidos[j] = i = int(np.argmin(base + acumulado * (1.0 / max(j, 1))))
+            base[i] = np.inf
+            acumulado += self.pares[i]
+        return escolhidos
+
+    def _bits(self, indices):
+        bits = np.zeros(self.palavras, dtype=np.uint64)
+        np.bitwise_or.at(bits, indices // 64, np.uint64(1) << (indices % 64).astype(np.uint64))
+        return bits
+
+    def gerar(self, qtd_bilhetes):
+        """(qtd_bilhetes x (vagas + fixos)) em int16 ordenado por linha, mais as métricas de cobertura."""
+        bits = np.zeros((qtd_bilhetes, self.palavras), dtype=np.uint64)
+        saida = np.empty((qtd_bilhetes, self.vagas + len(self.fixos)), dtype=np.int16)
+        vistos, sobreposicoes = set(), []
+        with INSTRUMENTACAO.span("bilhetes.cobertura"):
+            for t in range(qtd_bilhetes):
+                for tentativa in range(self.tentativas):
+                    indices = self._montar(1.0 + 2.0 * tentativa)
+                    linha = self._bits(indices)
+                    maior = int(_popcount(bits[:t] & linha).sum(axis=1).max()) if t else 0
+                    repetido = linha.tobytes() in vistos
+                    if not repetido and (self.limite is None or maior <= self.limite): break
+                INSTRUMENTACAO.contar("bilhetes.cobertura.tentativas", tentativa + 1)
+                vistos.add(linha.tobytes())
+                bits[t] = linha
+                sobreposicoes.append(maior)
+                self.uso[indices] += 1
+                self.pares[np.ix_(indices, indices)] += 1
+                saida[t] = np.sort(np.concatenate([self.elite[indices], self.fixos]))
+        np.fill_diagonal(self.pares, 0)
+        pares_possiveis = len(self.elite) * (len(self.elite) - 1) // 2
+        # Soma das sobreposições entre todos os pares de bilhetes = soma de C(uso, 2) por dezena
+        pares_bilhetes = qtd_bilhetes * (qtd_bilhetes - 1) / 2
+        metricas = {"bilhetes": qtd_bilhetes, "duplicados": qtd_bilhetes - len(vistos),
+                    "sobreposicao_max": max(sobreposicoes[1:], default=0),
+                    "sobreposicao_media": float((self.uso * (self.uso - 1) / 2).sum() / pares_bilhetes) if pares_bilhetes else 0.0,
+                    "dezenas_usadas": int((self.uso > 0).sum()), "pool": len(self.elite),
+                    "uso_min": int(self.uso.min()) if len(self.uso) else 0, "uso_max": int(self.uso.max()) if len(self.uso) else 0,
+                    "pares_cobertos": int((np.triu(self.pares, 1) > 0).sum()), "pares_possiveis": pares_possiveis}
+        return saida, metricas
+
 class MotorInferencia:
+    """Os métodos aceitam uma MatrizSorteios ou o DataFrame bruto com as colunas de dezenas."""
     @staticmethod
-    def executar_backtest_profundo(df_completo, cols_dezenas, profundidade=12):
+    def executar_backtest_profundo(df_completo, cols_dezenas, profundidade=12, intervalo_ia=1, parametros=None):
+        return MotorInferencia.resumir_backtest(MotorInferencia.backtest_por_dobra(df_completo, cols_dezenas, profundidade, intervalo_ia, parametros))
+
+    @staticmethod
+    def backtest_por_dobra(df_completo, cols_dezenas, profundidade=12, intervalo_ia=1, parametros=None):
+        """{dobra: {modelo: acertos}}; com história curta, só as dobras que ela comporta (vazio se falhar)."""
         try:
-            if len(df_completo) < (profundidade + 50): 
-                return "Hurst (Padrão)", 0, {}
-            placar = {"IA (Random Forest)": 0, "Hurst (Fractal)": 0, "Markov (Cadeias)": 0, "Gauss (Normal)": 0}
-            for i in range(profundidade):
-                alvo = set(df_completo.iloc[i][cols_dezenas].dropna().astype(int).values)
-                qtd = len(alvo)
-                df_treino = df_completo.iloc[i+1:].copy()
-                p_ia = MotorInferencia.gerar_aposta_final("IA", df_treino, cols_dezenas, qtd, seed_mix=i)
-                p_hurst = MotorInferencia.gerar_aposta_final("Hurst", df_treino, cols_dezenas, qtd, seed_mix=i)
-                p_markov = MotorInferencia.gerar_aposta_final("Markov", df_treino, cols_dezenas, qtd, seed_mix=i)
-                p_gauss = MotorInferencia.gerar_aposta_final("Gauss", df_treino, cols_dezenas, qtd, seed_mix=i)
-                placar["IA (Random Forest)"] += len(alvo.intersection(p_ia))
-                placar["Hurst (Fractal)"] += len(alvo.intersection(p_hurst))
-                placar["Markov (Cadeias)"] += len(alvo.intersection(p_markov))
-                placar["Gauss (Normal)"] += len(alvo.intersection(p_gauss))
-            melhor = max(placar, key=placar.get)
-            return melhor, placar[melhor], placar
+            profundidade = MotorInferencia.profundidade_possivel(len(df_completo), profundidade)
+            if profundidade <= 0: return {}
+            matriz = MatrizSorteios.garantir(df_completo, cols_dezenas)
+            with INSTRUMENTACAO.span("backtest"):
+                return BacktestIncremental(matriz, **(parametros or {})).avaliar(range(profundidade), intervalo_ia=intervalo_ia)
         except Exception as e:
-            return "Hurst (Padrão)", 0, {}
+            INSTRUMENTACAO.excecao("backtest", e)
+            return {}
+
+    # História inteira: um ajuste da floresta a cada 50 dobras
+    INTERVALO_IA_HISTORIA = 50
+
+    @staticmethod
+    def intervalo_ia_padrao(profundidade=12):
+        """
+        Dobras por ajuste da IA: 1 até 12 dobras; acima, ~12 ajustes por backtest, no custo do
+        backtest de 12 dobras, com a IA pontuada por uma floresta de até intervalo_ia - 1 sorteios
+        atrás. Depende só da profundidade pedida (não do tamanho da base), para a versão das
+        dobras no armazém não mudar a cada sorteio novo.
+        """
+        if profundidade is None: return MotorInferencia.INTERVALO_IA_HISTORIA
+        return max(1, -(-profundidade // 12))
+
+    @staticmethod
+    def profundidade_possivel(n, profundidade=None):
+        """Dobras que a história comporta (cada uma precisa de 50 sorteios de treino); None = história inteira."""
+        maximo = max(0, n - 50)
+        return maximo if profundidade is None else min(profundidade, maximo)
+
+    @staticmethod
+    def resumir_backtest(acertos_por_dobra):
+        if not acertos_por_dobra: return "Hurst (Padrão)", 0, {}
+        return BacktestIncremental.resumir(acertos_por_dobra)
 
     @staticmethod
     def prever_proximo(modelo_vencedor, df_completo, cols_dezenas, qtd_numeros_gerar, fixos=[], excluidos=[], seed_index=0):
         return MotorInferencia.gerar_aposta_final(modelo_vencedor, df_completo, cols_dezenas, qtd_numeros_gerar, fixos, excluidos, seed_mix=seed_index)
 
+    @staticmethod
+    def _tipo_modelo(modelo_nome):
+        if "IA" in modelo_nome: return "IA"
+        elif "Markov" in modelo_nome: return "Markov"
+        elif "Gauss" in modelo_nome: return "Gauss"
+        return "Hurst"
+
+    @staticmethod
+    def ranking_em_cache(tipo, matriz, qtd_pool, parametros=None):
+        parametros = parametros or {}
+        chave = (matriz.loteria, tipo, matriz.impressao, repr(sorted(parametros.items())), qtd_pool)
+        def calcular():
+            motor = BacktestIncremental(matriz, atributos=matriz.atributos(), **parametros)
+            ranking_freq = motor.ranking_frequencia(0)
+            return motor.ranking(tipo, 0, qtd_pool, ranking_freq), ranking_freq
+        return CACHE_RANKING.obter(chave, calcular)
+
     @staticmethod
     def gerar_aposta_final(modelo_nome, df, cols, qtd_alvo, fixos=[], excluidos=[], seed_mix=0):
-        tipo = "Hurst"
-        if "IA" in modelo_nome: tipo = "IA"
-        elif "Markov" in modelo_nome: tipo = "Markov"
-        elif "Gauss" in modelo_nome: tipo = "Gauss"
+        return MotorInferencia.gerar_lote(modelo_nome, df, cols, qtd_alvo, 1, fixos, excluidos, seed_inicial=seed_mix)[0]
+
+    @staticmethod
+    def gerar_lote(modelo_nome, df, cols, qtd_alvo, qtd_bilhetes, fixos=[], excluidos=[], seed_inicial=0, parametros=None):
+        """
+        Gera qtd_bilhetes apostas (sementes seed_inicial, seed_inicial+1, ...) a partir de um único ranking.
+        parametros: versão do motor (ex.: a estável da varredura); None usa os padrões.
+        """
+        bilhetes = MotorInferencia.gerar_bilhetes(modelo_nome, df, cols, qtd_alvo, qtd_bilhetes, fixos, excluidos, seed_inicial, parametros)
+        return [[int(n) for n in linha if n >= 0] for linha in bilhetes]
+
+    @staticmethod
+    def gerar_bilhetes(modelo_nome, df, cols, qtd_alvo, qtd_bilhetes, fixos=[], excluidos=[], seed_inicial=0, parametros=None):
+        """O mesmo lote de gerar_lote como array (qtd_bilhetes x qtd_alvo), -1 onde faltou dezena."""
+        if qtd_alvo - len(fixos) <= 0: return BacktestIncremental.selecionar_lote([], [], qtd_alvo, fixos, excluidos, range(qtd_bilhetes))
+        matriz = MatrizSorteios.garantir(df, cols)
+        config = {**BacktestIncremental.PARAMETROS, **(parametros or {})}
+        qtd_pool = max(qtd_alvo * config["fator_pool"], config["pool_minimo"])
+        ranking, ranking_freq = MotorInferencia.ranking_em_cache(MotorInferencia._tipo_modelo(modelo_nome), matriz, qtd_pool, parametros)
+        base = int(matriz.somas[0])
+        with INSTRUMENTACAO.span("bilhetes"):
+            INSTRUMENTACAO.contar("bilhetes.gerados", qtd_bilhetes)
+            sementes = [base + (seed * 9999) for seed in range(seed_inicial, seed_inicial + qtd_bilhetes)]
+            return BacktestIncremental.selecionar_lote(ranking, ranking_freq, qtd_alvo, fixos, excluidos, sementes, config["elite_extra"])
+
+    @staticmethod
+    def gerar_cobertura(modelo_nome, df, cols, qtd_alvo, qtd_bilhetes, fixos=[], excluidos=[], seed_inicial=0, parametros=None, limite_sobreposicao=None):
+        """
+        Carrinho montado em conjunto pelo GeradorCobertura sobre a mesma elite de gerar_bilhetes
+        (sem bilhetes repetidos, uso das dezenas equilibrado). Devolve (array, métricas).
+        """
         vagas = qtd_alvo - len(fixos)
-        if vagas <= 0: return sorted(list(set(fixos))[:qtd_alvo])
-        tamanho_pool = max(qtd_alvo * 3, 40)
-        ranking = MotorInferencia._obter_ranking(tipo, df, cols, tamanho_pool)
-        candidatos = [n for n in ranking if n not in excluidos and n not in fixos]
-        try:
-            seed_val = int(df.iloc[0][cols].sum()) + (seed_mix * 9999)
-            rng = np.random.default_rng(seed_val)
-            corte_elite = min(len(candidatos), vagas + 10) 
-            elite_pool = candidatos[:corte_elite]
-            escolhidos = list(rng.choice(elite_pool, size=vagas, replace=False))
-        except: escolhidos = candidates[:vagas]
-        if len(escolhidos) < vagas:
-            todas = df.head(50)[cols].values.flatten()
-            todas = todas[~np.isnan(todas)]
-            freq = pd.Series(todas).value_counts().index.tolist()
-            extras = [n for n in freq if n not in excluidos and n not in fixos and n not in escolhidos]
-            escolhidos.extend(extras[:vagas - len(escolhidos)])
-        final = list(set(escolhidos + fixos))
-        return sorted(final)
+        matriz = MatrizSorteios.garantir(df, cols)
+        config = {**BacktestIncremental.PARAMETROS, **(parametros or {})}
+        qtd_pool = max(qtd_alvo * config["fator_pool"], config["pool_minimo"])
+        ranking, ranking_freq = MotorInferencia.ranking_em_cache(MotorInferencia._tipo_modelo(modelo_nome), matriz, qtd_pool, parametros)
+        bloqueados = set(excluidos) | set(fixos)
+        elite = [n for n in ranking if n not in bloqueados][:max(vagas, 0) + config["elite_extra"]]
+        if vagas <= 0 or len(elite) < vagas:
+            return MotorInferencia.gerar_bilhetes(modelo_nome, matriz, cols, qtd_alvo, qtd_bilhetes, fixos, excluidos, seed_inicial, parametros), {}
+        INSTRUMENTACAO.contar("bilhetes.gerados", qtd_bilhetes)
+        gerador = GeradorCobertura(elite, vagas, fixos, int(matriz.somas[0]) + seed_inicial * 9999, limite_sobreposicao)
+        return gerador.gerar(qtd_bilhetes)
 
     @staticmethod
     def _obter_ranking(tipo, df, cols, qtd_pool):
-        todas = df.head(50)[cols].values.flatten()
-        todas = todas[~np.isnan(todas)]
-        freq = pd.Series(todas).value_counts()
-        ranking_freq = freq.index.tolist()
-        if tipo == "IA":
-            try:
-                data = df[cols].dropna().values.astype(int)
-                if len(data) < 20: return ranking_freq
-                data = data[::-1] 
-                X, y = [], []
-                win = 5
-                for i in range(len(data) - win):
-                    X.append(data[i:i+win].flatten())
-                    y.append(data[i+win])
-                model = RandomForestRegressor(n_estimators=50, random_state=42)
-                model.fit(X, y)
-                last = data[-win:].flatten().reshape(1, -1)
-                pred = model.predict(last)[0]
-                scores = {}
-                for val in pred:
-                    n = int(round(val))
-                    if n > 0: scores[n] = scores.get(n, 0) + 1
-                ranking_ia = sorted(scores.keys(), key=lambda x: scores[x], reverse=True)
-                for n in ranking_freq:
-                    if n not in ranking_ia: ranking_ia.append(n)
-                return ranking_ia[:qtd_pool]
-            except: return ranking_freq
-        elif tipo == "Hurst":
-            somas = df[cols].sum(axis=1).head(60).values
-            try:
-                ts = np.array(somas)
-                lags = range(2, 20)
-                tau = [np.sqrt(np.std(np.subtract(ts[lag:], ts[:-lag]))) for lag in lags]
-                poly = np.polyfit(np.log(lags), np.log(tau), 1)
-                h = poly[0] * 2.0
-            except: h = 0.5
-            if h < 0.45: return ranking_freq[::-1][:qtd_pool]
-            return ranking_freq[:qtd_pool]
-        elif tipo == "Markov":
-            ultimo = set(df.iloc[0][cols].dropna().values)
-            candidatos = []
-            for i in range(1, min(100, len(df)-1)):
-                passado = set(df.iloc[i][cols].dropna().values)
-                if len(ultimo.intersection(passado)) >= 2:
-                    candidatos.extend(df.iloc[i-1][cols].dropna().values)
-            if candidatos:
-                ranking_mk = pd.Series(candidatos).value_counts().index.tolist()
-                full = ranking_mk + [x for x in ranking_freq if x not in ranking_mk]
-                return full[:qtd_pool]
-            return ranking_freq[:qtd_pool]
-        elif tipo == "Gauss": return ranking_freq[:qtd_pool]
-        return ranking_freq[:qtd_pool]
+        return MotorInferencia.ranking_em_cache(tipo, MatrizSorteios.garantir(df, cols), qtd_pool)[0]
+
+# Tabelas de consulta indexadas pela dezena (0-255), para as estatísticas dos bilhetes
+_PRIMOS = np.zeros(256, dtype=bool)
+_PRIMOS[[2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97]] = True
+_FIBONACCI = np.zeros(256, dtype=bool)
+_FIBONACCI[[1, 2, 3, 5, 8, 13, 21, 34, 55, 89]] = True
+
+def estatisticas_bilhetes(bilhetes):
+    """Pares, ímpares, soma, primos, Fibonacci e equilíbrio par/ímpar (0-1) de cada linha de um lote (-1 = vazio)."""
+    bilhetes = np.atleast_2d(bilhetes)
+    validos = bilhetes >= 0
+    valores = np.where(validos, bilhetes, 0).astype(np.int64)
+    qtd = validos.sum(axis=1)
+    pares = (validos & (valores % 2 == 0)).sum(axis=1)
+    razao = pares / np.maximum(qtd, 1)
+    return {"pares": pares, "impares": qtd - pares, "soma": valores.sum(axis=1),
+            "primos": (validos & _PRIMOS[valores]).sum(axis=1), "fibonacci": (validos & _FIBONACCI[valores]).sum(axis=1),
+            "equilibrio": np.where(qtd > 0, np.maximum(0.0, 1.0 - np.abs(razao - 0.5) * 2), 0.0)}
+
+def empilhar_bilhetes(blocos):
+    """Junta lotes de larguras diferentes (itens do carrinho) num único array int16, completando com -1."""
+    largura = max([b.shape[1] for b in blocos] + [0])
+    if not blocos: return np.empty((0, 0), dtype=np.int16)
+    return np.vstack([np.pad(b, ((0, 0), (0, largura - b.shape[1])), constant_values=-1) for b in blocos]).astype(np.int16)
+
+def _media_validos(valores, padrao=0.5):
+    validos = ~np.isnan(valores)
+    total = np.where(validos, valores, 0).sum(axis=0)
+    return np.where(validos.any(axis=0), total / np.maximum(validos.sum(axis=0), 1), padrao)
 
 class MotorFractal:
-    pass
+    """
+    Expoentes de Hurst por R/S e DFA em várias escalas, vetorizados sobre todas as dezenas.
+    As séries (cronológicas) são a indicadora de cada dezena e a soma do sorteio (agregado).
+    Cada escala s divide a história em blocos disjuntos de s sorteios e guarda apenas os
+    acumuladores dos blocos fechados mais o bloco em aberto, então anexar um sorteio custa
+    O(escalas) operações vetoriais (amortizado) em vez de recalcular a história inteira.
+    """
+    ESCALAS = (4, 8, 16, 32, 64)
+
+    def __init__(self, matriz, cursor=0, escalas=None):
+        self.m = matriz
+        self.escalas = np.array(escalas or self.ESCALAS)
+        self.reconstruir(cursor)
+
+    def _series(self, linhas):
+        oh = self.m.onehot(linhas).astype(np.float64)
+        return np.column_stack([oh, self.m.somas[linhas].astype(np.float64)])
+
+    def reconstruir(self, cursor):
+        colunas = self.m.universo + 1
+        self.soma_rs = np.zeros((len(self.escalas), colunas))
+        self.n_rs = np.zeros((len(self.escalas), colunas))
+        self.soma_f2 = np.zeros((len(self.escalas), colunas))
+        self.n_f2 = np.zeros(len(self.escalas))
+        self.abertos = [np.empty((0, colunas)) for _ in self.escalas]
+        serie = self._series(slice(cursor, self.m.n))[::-1]
+        for j, s in enumerate(self.escalas):
+            fechados = (len(serie) // s) * s
+            self._acumular(j, serie[:fechados].reshape(-1, s, colunas))
+            self.abertos[j] = serie[fechados:].copy()
+        self.cursor = cursor
+
+    def _acumular(self, j, blocos):
+        if len(blocos) == 0: return
+        desvio = blocos - blocos.mean(axis=1, keepdims=True)
+        perfil = np.cumsum(desvio, axis=1)
+        # R/S: amplitude do perfil sobre o desvio-padrão do bloco (blocos constantes são ignorados)
+        amplitude = perfil.max(axis=1) - perfil.min(axis=1)
+        dp = blocos.std(axis=1)
+        validos = dp > 0
+        self.soma_rs[j] += np.where(validos, amplitude / np.where(validos, dp, 1), 0).sum(axis=0)
+        self.n_rs[j] += validos.sum(axis=0)
+        # DFA: resíduo quadrático médio do perfil após remover a tendência linear do bloco
+        t = np.arange(blocos.shape[1]) - (blocos.shape[1] - 1) / 2
+        centrado = perfil - perfil.mean(axis=1, keepdims=True)
+        inclinacao = np.einsum('t,btc->bc', t, centrado) / (t @ t)
+        residuo = centrado - inclinacao[:, None, :] * t[None, :, None]
+        self.soma_f2[j] += (residuo ** 2).mean(axis=1).sum(axis=0)
+        self.n_f2[j] += len(blocos)
+
+    def adicionar(self, linha):
+        """Anexa o sorteio da linha informada (o próximo em ordem cronológica)."""
+        valores = self._series(slice(linha, linha + 1))
+        for j, s in enumerate(self.escalas):
+            self.abertos[j] = np.vstack([self.abertos[j], valores])
+            if len(self.abertos[j]) == s:
+                self._acumular(j, self.abertos[j][None])
+                self.abertos[j] = self.abertos[j][:0]
+        self.cursor = linha
+
+    def posicionar(self, cursor):
+        if cursor > self.cursor: self.reconstruir(cursor)
+        for linha in range(self.cursor - 1, cursor - 1, -1): self.adicionar(linha)
+
+    @staticmethod
+    def _inclinacao(x, Y, validos):
+        """Regressão log-log por coluna considerando só as escalas válidas de cada coluna."""
+        w = validos.astype(np.float64)
+        Y = np.where(validos, Y, 0)
+        n = w.sum(axis=0)
+        mx = (w * x[:, None]).sum(axis=0) / np.maximum(n, 1)
+        my = (w * Y).sum(axis=0) / np.maximum(n, 1)
+        dx = (x[:, None] - mx) * w
+        var = (dx * (x[:, None] - mx)).sum(axis=0)
+        cov = (dx * (Y - my)).sum(axis=0)
+        return np.where((n >= 2) & (var > 0), cov / np.where(var > 0, var, 1), np.nan)
+
+    def expoentes(self):
+        x = np.log(self.escalas.astype(np.float64))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = self.soma_rs / self.n_rs
+            f = np.sqrt(self.soma_f2 / self.n_f2[:, None])
+            h_rs = self._inclinacao(x, np.log(rs), (self.n_rs > 0) & (rs > 0))
+            h_dfa = self._inclinacao(x, np.log(f), (self.n_f2[:, None] > 0) & (f > 0))
+        return {"rs": h_rs[:-1], "dfa": h_dfa[:-1], "rs_agregado": float(h_rs[-1]), "dfa_agregado": float(h_dfa[-1])}
+
+    def pontuar(self, frequencia):
+        """
+        Score por dezena: desvio da frequência recente ponderado pela persistência (H - 0.5)
+        da própria dezena somada à do agregado. Persistentes quentes e antipersistentes frias sobem.
+        """
+        h = self.expoentes()
+        h_dezena = _media_validos(np.vstack([h["rs"], h["dfa"]]))
+        h_agregado = _media_validos(np.array([[h["rs_agregado"]], [h["dfa_agregado"]]]))[0]
+        freq = np.asarray(frequencia, dtype=np.float64)
+        desvio = (freq - freq.mean()) / (freq.std() or 1.0)
+        return desvio * ((h_dezena - 0.5) + (h_agregado - 0.5))
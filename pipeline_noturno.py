@@ -0,0 +1,176 @@
+"""
+FRACTALV - Rotina Noturna (headless)
+Executa a rotina das 22h10 sem abrir a interface: ingestão -> backtest -> significância e escolha
+do modelo vencedor -> geração dos bilhetes -> exportação CSV/TXT, para todos ou alguns jogos. O
+resumo fica em resultados/resumo.json, que o app carrega na abertura sem recalcular nada.
+
+Uso:
+    python -m pipeline_noturno
+    python -m pipeline_noturno --jogos MEGA_SENA QUINA --orcamento 50 --modo EQUILIBRIO
+    python -m pipeline_noturno --workers 1 --bilhetes 20 --saida /tmp/fractalv
+    python -m pipeline_noturno --profundidade 0          # história inteira (retomável)
+    python -m pipeline_noturno --profundidade 0 --intervalo-ia 10
+"""
+import argparse
+import json
+import os
+import sys
+import pandas as pd
+from datetime import datetime
+from links_planilhas import LINKS_CSV, FORMATOS_JOGOS, JOGOS_LISTA
+from motor_matematico import MotorInferencia, MotorFractal, OtimizadorFinanceiro, empilhar_bilhetes
+from exportacao import exportar as exportar_bilhetes, parquet_disponivel
+from ingestao import IngestorDados
+from significancia import BaselineAleatoria
+from armazem_dobras import ArmazemDobras
+from varredura import carregar_versoes, parametros_estaveis
+from instrumentacao import INSTRUMENTACAO
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+PROFUNDIDADE = 12
+SIMULACOES = 50000
+
+def analisar_jogo(matriz, dobras=None, profundidade=PROFUNDIDADE, simulacoes=SIMULACOES, salvo=None, parametros=None):
+    """
+    Backtest (se as dobras não vierem prontas), significância contra o jogo aleatório,
+    frequência recente e expoentes fractais. salvo: entrada do resumo.json, que dispensa
+    backtest e simulação. parametros: versão do motor (varredura.parametros_estaveis).
+    """
+    if salvo is not None:
+        vencedor, score_total, placar_dict, significancia = salvo["vencedor"], salvo["score"], salvo["placar"], salvo.get("significancia", {})
+    else:
+        if dobras is None: dobras = MotorInferencia.backtest_por_dobra(matriz, matriz.cols, profundidade, MotorInferencia.intervalo_ia_padrao(profundidade), parametros)
+        vencedor, score_total, placar_dict = MotorInferencia.resumir_backtest(dobras)
+        significancia = BaselineAleatoria(matriz, simulacoes).avaliar(dobras) if simulacoes else {}
+    freq = matriz.serie_frequencia(0, 50)
+    with INSTRUMENTACAO.span("fractal"): fractal = MotorFractal(matriz).expoentes()
+    return vencedor, score_total, placar_dict, freq, fractal, significancia
+
+def executar_backtests(matrizes, profundidade=PROFUNDIDADE, workers=None, progresso=None, parametros=None, armazem=None, intervalo_ia=None):
+    """
+    {jogo: {dobra: {modelo: acertos}}}, em série (workers=1) ou no pool de processos. Só as dobras
+    que faltam no armazém são calculadas; profundidade=None percorre a história inteira.
+    intervalo_ia: dobras por ajuste da IA (None = MotorInferencia.intervalo_ia_padrao).
+    """
+    return (armazem or ArmazemDobras()).completar(matrizes, profundidade, intervalo_ia, workers=workers, progresso=progresso, parametros=parametros)
+
+def montar_carrinho(jogo, matriz, otimizador, orcamento=None, modo="POTENCIA", bilhetes=10):
+    """Carrinho do otimizador quando há orçamento e tabela; senão, N volantes da aposta mínima."""
+    if orcamento is not None and otimizador is not None:
+        res = otimizador.calcular_melhor_estrategia(jogo, orcamento, modo=modo)
+        if "erro" not in res: return res["carrinho"]
+    dezenas = FORMATOS_JOGOS.get(jogo, {}).get("aposta_min", matriz.k)
+    return [{"qtd_volantes": bilhetes, "dezenas": dezenas, "custo_total": None}]
+
+def gerar_bilhetes(vencedor, matriz, carrinho, fixos=[], excluidos=[], parametros=None, cobertura=False):
+    """Lote do carrinho inteiro (int16, uma linha por bilhete, -1 = vazio), na ordem dos itens."""
+    blocos, idx_global = [], 0
+    for item in carrinho:
+        q_v, q_d = int(item["qtd_volantes"]), int(item["dezenas"])
+        if cobertura: lote = MotorInferencia.gerar_cobertura(vencedor, matriz, matriz.cols, q_d, q_v, fixos, excluidos, seed_inicial=idx_global + 1, parametros=parametros)[0]
+        else: lote = MotorInferencia.gerar_bilhetes(vencedor, matriz, matriz.cols, q_d, q_v, fixos, excluidos, seed_inicial=idx_global + 1, parametros=parametros)
+        blocos.append(lote)
+        idx_global += q_v
+    return empilhar_bilhetes(blocos)
+
+def exportar(jogo, bilhetes, modelo, pasta, formatos=("csv", "txt")):
+    """Grava {jogo}.csv/.txt/.parquet em blocos direto do array (memória constante)."""
+    for formato in formatos:
+        with INSTRUMENTACAO.span(f"exportacao.{formato}"): exportar_bilhetes(formato, bilhetes, modelo, os.path.join(pasta, f"{jogo}.{formato}"))
+
+def _gravar_json(caminho, dados):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f: json.dump(dados, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+def carregar_resumo(pasta=DIRETORIO_RESULTADOS):
+    try:
+        with open(os.path.join(pasta, "resumo.json"), encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def ler_valores(pasta=DIRETORIO_RESULTADOS):
+    """Tabela de preços salva pela rotina (textos 'R$ 5,00' preservados, como na planilha)."""
+    try: return pd.read_csv(os.path.join(pasta, "VALORES.csv"), sep=';', dtype=str)
+    except (OSError, ValueError): return None
+
+def executar(jogos=None, pasta=DIRETORIO_RESULTADOS, orcamento=None, modo="POTENCIA", bilhetes=10,
+             profundidade=PROFUNDIDADE, workers=None, simulacoes=SIMULACOES, cobertura=False, formatos=("csv", "txt"),
+             ingestor=None, armazem=None, log=print, intervalo_ia=None):
+    jogos = list(jogos or JOGOS_LISTA)
+    if intervalo_ia is None: intervalo_ia = MotorInferencia.intervalo_ia_padrao(profundidade)
+    if "parquet" in formatos and not parquet_disponivel():
+        log("  Parquet indisponível (pip install pyarrow); exportando só CSV/TXT")
+        formatos = [f for f in formatos if f != "parquet"]
+    os.makedirs(pasta, exist_ok=True)
+    # Medições num registro desta execução: somadas ao do processo no fim, sem zerar as de outras
+    with INSTRUMENTACAO.nova_execucao() as medicoes:
+        ingestor = ingestor or IngestorDados()
+
+        log(f"[1/4] Ingestão: {', '.join(jogos)}")
+        bases = ingestor.carregar_todos(jogos)
+        matrizes = {jogo: bases.get(jogo) for jogo in jogos}
+        otimizador = None
+        if bases.get("VALORES") is not None:
+            bases["VALORES"].to_csv(os.path.join(pasta, "VALORES.csv"), sep=';', index=False)
+            otimizador = OtimizadorFinanceiro(LINKS_CSV.get("VALORES"))
+            if not otimizador.carregar_dados(bases["VALORES"]): otimizador = None
+
+        log(f"[2/4] Backtest (dobras: {profundidade or 'história inteira'}; IA reajustada a cada {intervalo_ia})")
+        versoes = carregar_versoes()
+        parametros = {jogo: parametros_estaveis(jogo, versoes) for jogo in jogos}
+        dobras = executar_backtests(matrizes, profundidade, workers, parametros=parametros, armazem=armazem, intervalo_ia=intervalo_ia)
+
+        log("[3/4] Vencedores e bilhetes")
+        resumo = carregar_resumo(pasta) or {"jogos": {}}
+        resumo["gerado_em"] = datetime.now().isoformat(timespec="seconds")
+        for jogo in jogos:
+            matriz = matrizes[jogo]
+            if matriz is None:
+                log(f"  {jogo}: falha ao carregar dados")
+                continue
+            # Uma planilha ruim não derruba a rotina: os outros jogos seguem e entram no resumo
+            try:
+                vencedor, score_total, placar_dict, freq, fractal, significancia = analisar_jogo(matriz, dobras.get(jogo), profundidade, simulacoes, parametros=parametros[jogo])
+                carrinho = montar_carrinho(jogo, matriz, otimizador, orcamento, modo, bilhetes)
+                bilhetes_gerados = gerar_bilhetes(vencedor, matriz, carrinho, parametros=parametros[jogo], cobertura=cobertura)
+                exportar(jogo, bilhetes_gerados, vencedor, pasta, formatos)
+                resumo["jogos"][jogo] = {
+                    "concurso": int(matriz.concursos[0]) if matriz.concursos is not None and len(matriz.concursos) else None,
+                    "impressao": matriz.impressao, "profundidade": profundidade, "intervalo_ia": intervalo_ia,
+                    "versao": ((versoes["jogos"].get(jogo) or {}).get("estavel") or {}).get("versao", 0),
+                    "vencedor": vencedor, "score": score_total, "placar": placar_dict, "significancia": significancia,
+                    "hurst_rs": fractal["rs_agregado"], "hurst_dfa": fractal["dfa_agregado"],
+                    "carrinho": carrinho, "bilhetes": len(bilhetes_gerados),
+                }
+                p_valor = f", p={significancia['p_vencedor']:.3f}" if significancia else ""
+                log(f"  {jogo}: {vencedor} ({score_total} acertos{p_valor}) -> {len(bilhetes_gerados)} bilhetes")
+            except Exception as e:
+                INSTRUMENTACAO.excecao(f"pipeline.{jogo}", e)
+                log(f"  {jogo}: falha ({e})")
+
+        log(f"[4/4] Resumo em {os.path.join(pasta, 'resumo.json')}")
+        resumo["instrumentacao"] = medicoes.resumo()
+        _gravar_json(os.path.join(pasta, "resumo.json"), resumo)
+        return resumo
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rotina noturna do FRACTALV (sem interface)")
+    parser.add_argument("--jogos", nargs="+", choices=JOGOS_LISTA)
+    parser.add_argument("--saida", default=DIRETORIO_RESULTADOS)
+    parser.add_argument("--orcamento", type=float, help="orçamento por jogo (R$); sem ele, --bilhetes volantes mínimos")
+    parser.add_argument("--modo", default="POTENCIA", choices=["POTENCIA", "EQUILIBRIO", "OTIMO"])
+    parser.add_argument("--bilhetes", type=int, default=10)
+    parser.add_argument("--profundidade", type=int, default=PROFUNDIDADE, help="dobras do backtest (0 = história inteira)")
+    parser.add_argument("--intervalo-ia", type=int, help="dobras por ajuste da IA (padrão: 1 até 12 dobras, ~12 ajustes acima, 50 na história inteira)")
+    parser.add_argument("--workers", type=int, help="processos do backtest (1 = serial, padrão = todos os núcleos)")
+    parser.add_argument("--simulacoes", type=int, default=SIMULACOES, help="placares aleatórios por modelo na linha de base (0 desliga)")
+    parser.add_argument("--cobertura", action="store_true", help="monta cada carrinho em conjunto, sem bilhetes repetidos")
+    parser.add_argument("--formatos", nargs="+", default=["csv", "txt"], choices=["csv", "txt", "parquet"], help="arquivos de bilhetes por jogo (parquet requer pyarrow)")
+    parser.add_argument("--perf", action="store_true", help="liga a instrumentação e grava os tempos no resumo")
+    args = parser.parse_args(argv)
+    if args.perf: INSTRUMENTACAO.ativo = True
+    executar(args.jogos, args.saida, args.orcamento, args.modo, args.bilhetes, args.profundidade or None, args.workers, args.simulacoes, args.cobertura, args.formatos, intervalo_ia=args.intervalo_ia)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+FRACTALV - Linha de Base Aleatória (Monte Carlo)
+Responde se o placar do backtest é melhor que jogar ao acaso. Para cada dobra, sorteia
+milhões de bilhetes aleatórios do mesmo tamanho que os modelos jogaram, em blocos NumPy, e
+conta os acertos por interseção de bits com o sorteio-alvo (como em MatrizSorteios). A soma
+por simulação forma a distribuição nula do placar: dela saem o p-valor de cada modelo, a
+faixa de 95% do jogo aleatório e o p-valor do vencedor corrigido por ter sido o melhor de N.
+"""
+import numpy as np
+from links_planilhas import FORMATOS_JOGOS
+from motor_matematico import BacktestIncremental, _popcount
+from instrumentacao import INSTRUMENTACAO
+
+def _wilson(sucessos, total, z=1.96):
+    """Intervalo de 95% para uma proporção (erro de Monte Carlo do p-valor)."""
+    if total <= 0: return [0.0, 1.0]
+    p = sucessos / total
+    centro = (p + z * z / (2 * total)) / (1 + z * z / total)
+    raio = z * np.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / (1 + z * z / total)
+    return [float(max(0.0, centro - raio)), float(min(1.0, centro + raio))]
+
+class BaselineAleatoria:
+    """
+    simulacoes: placares aleatórios simulados por jogador. Cada simulação joga uma dobra
+    inteira para cada um dos N modelos, então o custo é simulacoes x dobras x N bilhetes.
+    """
+    def __init__(self, matriz, simulacoes=50000, semente=0, tamanho_bloco=65536, reamostras=10000):
+        self.m = matriz
+        self.simulacoes = simulacoes
+        self.semente = semente
+        self.tamanho_bloco = tamanho_bloco
+        self.reamostras = reamostras
+        formato = FORMATOS_JOGOS.get(matriz.loteria)
+        if formato: self.numeros = np.arange(formato["inicio"], formato["inicio"] + formato["universo"], dtype=np.uint64)
+        else: self.numeros = np.unique(matriz.dezenas[matriz.valido]).astype(np.uint64)
+
+    def esperado(self, qtd_alvo, qtd_bilhete):
+        """Média hipergeométrica de acertos de um bilhete aleatório (ex.: 6/60 -> 0,6 por concurso)."""
+        return qtd_alvo * qtd_bilhete / len(self.numeros)
+
+    def _bilhetes(self, rng, quantidade, tamanho):
+        """(quantidade x palavras) máscaras de bits de bilhetes sem repetição, via argpartition de chaves aleatórias."""
+        chaves = rng.random((quantidade, len(self.numeros)), dtype=np.float32)
+        indices = np.argpartition(chaves, tamanho - 1, axis=1)[:, :tamanho] if tamanho < len(self.numeros) else np.broadcast_to(np.arange(len(self.numeros)), (quantidade, len(self.numeros)))
+        valores = self.numeros[indices]
+        bits = np.zeros((quantidade, self.m.palavras), dtype=np.uint64)
+        for palavra in range(self.m.palavras):
+            na_palavra = (valores // 64) == palavra
+            bits[:, palavra] = np.bitwise_or.reduce(np.where(na_palavra, np.uint64(1) << (valores % 64), np.uint64(0)), axis=1)
+        return bits
+
+    def simular(self, dobras, jogadores=1):
+        """Placar total de cada jogador aleatório em cada simulação: (simulacoes x jogadores)."""
+        rng = np.random.default_rng(self.semente)
+        totais = np.zeros(self.simulacoes * jogadores, dtype=np.int32)
+        with INSTRUMENTACAO.span("significancia.simulacao"):
+            for i in dobras:
+                alvo = self.m.bits[i]
+                tamanho = int(self.m.valido[i].sum())
+                if tamanho == 0: continue
+                for inicio in range(0, len(totais), self.tamanho_bloco):
+                    fim = min(inicio + self.tamanho_bloco, len(totais))
+                    totais[inicio:fim] += _popcount(self._bilhetes(rng, fim - inicio, tamanho) & alvo).sum(axis=1, dtype=np.int32)
+            INSTRUMENTACAO.contar("significancia.bilhetes", len(totais) * len(dobras))
+        return totais.reshape(self.simulacoes, jogadores)
+
+    def _intervalo_placar(self, acertos, rng):
+        """IC 95% do placar do modelo por bootstrap das dobras."""
+        if len(acertos) == 0: return [0.0, 0.0]
+        amostras = acertos[rng.integers(0, len(acertos), size=(self.reamostras, len(acertos)))].sum(axis=1)
+        return [float(v) for v in np.quantile(amostras, [0.025, 0.975])]
+
+    def avaliar(self, acertos_por_dobra):
+        """
+        acertos_por_dobra: {dobra: {modelo: acertos}} como devolvido pelo backtest.
+        Devolve um dicionário serializável em JSON (vai para o resumo da rotina noturna).
+        """
+        if not acertos_por_dobra: return {}
+        dobras = sorted(acertos_por_dobra)
+        nomes = [n for n in BacktestIncremental.MODELOS if all(n in acertos_por_dobra[i] for i in dobras)]
+        if not nomes: return {}
+        totais = self.simular(dobras, jogadores=len(nomes))
+        nulo, melhor_aleatorio = totais[:, 0], totais.max(axis=1)
+        esperado = sum(self.esperado(int(self.m.valido[i].sum()), int(self.m.valido[i].sum())) for i in dobras)
+        rng = np.random.default_rng(self.semente + 1)
+        modelos = {}
+        for nome in nomes:
+            acertos = np.array([acertos_por_dobra[i][nome] for i in dobras], dtype=np.int64)
+            score = int(acertos.sum())
+            extremos = int((nulo >= score).sum())
+            modelos[nome] = {"score": score, "excesso": round(score - esperado, 3),
+                             "p_valor": (extremos + 1) / (self.simulacoes + 1), "ic_p": _wilson(extremos, self.simulacoes),
+                             "ic_score": self._intervalo_placar(acertos, rng)}
+        vencedor = max(modelos, key=lambda n: modelos[n]["score"])
+        return {"simulacoes": self.simulacoes, "dobras": len(dobras), "esperado": round(esperado, 3),
+                "media_aleatoria": float(nulo.mean()), "ic_aleatorio": [float(v) for v in np.quantile(nulo, [0.025, 0.975])],
+                "modelos": modelos, "vencedor": vencedor,
+                "p_vencedor": (int((melhor_aleatorio >= modelos[vencedor]["score"]).sum()) + 1) / (self.simulacoes + 1)}
@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import gerar_historico
+
+
+@pytest.fixture
+def pasta_fonte(tmp_path):
+    """Pasta no formato da FonteLocal com históricos sintéticos curtos (120 concursos)."""
+    pasta = tmp_path / "fonte"
+    pasta.mkdir()
+    for semente, jogo in enumerate(("MEGA_SENA", "QUINA")):
+        gerar_historico(jogo, 120, semente).to_csv(pasta / f"{jogo}.csv", index=False)
+    return pasta
+
+
+def anexar_concursos(pasta, jogo, quantidade=1, semente=99):
+    """Acrescenta concursos novos no topo da planilha (mais novo primeiro, como no Sheets)."""
+    import pandas as pd
+    caminho = pasta / f"{jogo}.csv"
+    atual = pd.read_csv(caminho)
+    novos = gerar_historico(jogo, quantidade, semente)
+    novos["Concurso"] = novos["Concurso"] + int(atual["Concurso"].max())
+    pd.concat([novos, atual]).to_csv(caminho, index=False)
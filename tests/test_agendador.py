@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import agendador
+from agendador import AgendadorRotina, RelogioSimulado
+from armazem_dobras import ArmazemDobras
+from cache_compartilhado import CacheJogos
+from ingestao import IngestorDados, FonteLocal
+from conftest import anexar_concursos
+
+JOGOS = ["MEGA_SENA", "QUINA"]
+
+
+@pytest.fixture
+def rotina(tmp_path, pasta_fonte):
+    def montar(inicio=datetime(2026, 10, 18, 21, 0), **kwargs):
+        ingestor = IngestorDados(FonteLocal(str(pasta_fonte)), diretorio_cache=str(tmp_path / "cache"), tamanho_bloco=16)
+        return AgendadorRotina(JOGOS, ingestor, ArmazemDobras(str(tmp_path / "dobras.sqlite")), CacheJogos(),
+                               RelogioSimulado(inicio), janela=timedelta(hours=1), intervalo=600, workers=1, **kwargs)
+    return montar
+
+
+def contar_verificacoes(ag):
+    horarios = []
+    ag.verificar = lambda: horarios.append(ag.relogio.agora()) or []
+    return horarios
+
+
+def test_verifica_so_a_partir_do_corte(rotina):
+    ag = rotina()
+    horarios = contar_verificacoes(ag)
+    ag.executar(ate=datetime(2026, 10, 18, 22, 5))
+    assert horarios == []
+    ag.executar(ate=datetime(2026, 10, 18, 22, 25))
+    assert [h.strftime("%H:%M") for h in horarios] == ["22:10", "22:20"]
+
+
+def test_fora_da_janela_dorme_ate_o_proximo_corte(rotina):
+    ag = rotina(inicio=datetime(2026, 10, 18, 23, 30))
+    horarios = contar_verificacoes(ag)
+    ag.executar(ate=datetime(2026, 10, 19, 22, 0))
+    assert horarios == []
+    ag.acordar()
+    ag.executar(ate=datetime(2026, 10, 19, 22, 1))
+    assert len(horarios) == 1
+
+
+def test_concurso_novo_recalcula_so_o_jogo_afetado(rotina, pasta_fonte, tmp_path, monkeypatch):
+    ag = rotina()
+    assert sorted(ag.verificar()) == JOGOS
+    geracao, mega = ag.cache.geracao, ag.cache.obter("MEGA_SENA")
+
+    processados = []
+    original = agendador.processar_jogo
+    monkeypatch.setattr(agendador, "processar_jogo", lambda jogo, *a, **k: processados.append(jogo) or original(jogo, *a, **k))
+
+    # Sem novidade não há recálculo nem publicação
+    assert ag.verificar() == []
+    assert processados == [] and ag.cache.geracao == geracao
+
+    anexar_concursos(pasta_fonte, "QUINA")
+    ag.executar(ate=datetime(2026, 10, 18, 22, 15))
+    assert processados == ["QUINA"]
+    assert ag.estado["publicados"] == ["QUINA"]
+    assert ag.cache.geracao == geracao + 1
+    assert ag.cache.obter("MEGA_SENA") is mega
+    assert int(ag.cache.obter("QUINA")[0].concursos[0]) == 121
+
+    # O cache .npz atualizado de forma incremental é igual a uma releitura completa
+    incremental = ag.ingestor.ler_cache("QUINA")
+    completo = IngestorDados(FonteLocal(str(pasta_fonte)), diretorio_cache=str(tmp_path / "releitura")).atualizar("QUINA")
+    for nome in ("dezenas", "valido", "concursos", "cols"):
+        np.testing.assert_array_equal(incremental[nome], completo[nome])
+
+
+def test_leitura_incremental_em_blocos(tmp_path, pasta_fonte):
+    ingestor = IngestorDados(FonteLocal(str(pasta_fonte)), diretorio_cache=str(tmp_path / "cache"), tamanho_bloco=16)
+    ingestor.atualizar("MEGA_SENA")
+    # Mais concursos novos que um bloco: a leitura atravessa dois blocos e para no primeiro já armazenado
+    anexar_concursos(pasta_fonte, "MEGA_SENA", quantidade=20)
+    atualizado = ingestor.atualizar("MEGA_SENA")
+    assert ingestor.linhas_processadas["MEGA_SENA"] == 20
+    completo = IngestorDados(FonteLocal(str(pasta_fonte)), diretorio_cache=str(tmp_path / "releitura")).atualizar("MEGA_SENA")
+    for nome in ("dezenas", "valido", "concursos"):
+        np.testing.assert_array_equal(atualizado[nome], completo[nome])
+
+
+def test_thread_acorda_e_para(rotina):
+    ag = rotina()
+    verificou = threading.Event()
+    ag.verificar = lambda: verificou.set() or []
+    ag.relogio = agendador.RelogioSistema()
+    ag.iniciar(verificar_agora=True)
+    assert verificou.wait(10)
+    ag.parar(5)
+    assert not ag._thread.is_alive()
@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exportacao import exportar, partes_csv, partes_txt, escrever
+from motor_matematico import empilhar_bilhetes
+
+MODELOS = ["Gauss (Normal)", 'Modelo; com "aspas"']
+
+
+@pytest.fixture
+def bilhetes():
+    """Carrinho com apostas de tamanhos diferentes (linhas completadas com -1)."""
+    rng = np.random.default_rng(0)
+    blocos = [np.sort(rng.choice(np.arange(1, 61), (qtd, dezenas), replace=True), axis=1) for qtd, dezenas in ((13, 6), (4, 9), (1, 15))]
+    return empilhar_bilhetes(blocos)
+
+
+def linhas(bilhetes):
+    return [[n for n in linha if n >= 0] for linha in bilhetes.tolist()]
+
+
+def csv_referencia(bilhetes, modelo):
+    """Como o app montava o CSV antes: DataFrame + to_csv."""
+    dezenas = linhas(bilhetes)
+    df = pd.DataFrame({"Jogo": np.arange(1, len(dezenas) + 1), "Modelo": modelo, "Dezenas": [", ".join(map(str, d)) for d in dezenas],
+                       "Stats": [f"P:{sum(1 for n in d if n % 2 == 0)} S:{sum(d)}" for d in dezenas]})
+    saida = io.BytesIO()
+    df.to_csv(saida, index=False, sep=";")
+    return saida.getvalue()
+
+
+def txt_referencia(bilhetes):
+    return "\n".join(f"Jogo {i}: {d}" for i, d in enumerate(linhas(bilhetes), start=1)).encode()
+
+
+@pytest.mark.parametrize("modelo", MODELOS)
+@pytest.mark.parametrize("bloco", [1, 5, 8192])
+def test_csv_igual_ao_pandas(bilhetes, modelo, bloco):
+    assert b"".join(partes_csv(bilhetes, modelo, bloco=bloco)) == csv_referencia(bilhetes, modelo)
+
+
+@pytest.mark.parametrize("bloco", [1, 5, 8192])
+def test_txt_igual_a_juncao(bilhetes, bloco):
+    assert b"".join(partes_txt(bilhetes, bloco=bloco)) == txt_referencia(bilhetes)
+
+
+def test_exportar_em_arquivo(bilhetes, tmp_path):
+    destino = str(tmp_path / "bilhetes.csv")
+    exportar("csv", bilhetes, MODELOS[0], destino)
+    with open(destino, "rb") as f: assert f.read() == exportar("csv", bilhetes, MODELOS[0])
+    assert escrever(io.BytesIO(), partes_txt(bilhetes)) == len(txt_referencia(bilhetes))
+
+
+def test_parquet(bilhetes):
+    pq = pytest.importorskip("pyarrow.parquet")
+    tabela = pq.read_table(io.BytesIO(exportar("parquet", bilhetes, MODELOS[1]))).to_pandas()
+    assert tabela["Jogo"].tolist() == list(range(1, len(bilhetes) + 1))
+    assert set(tabela["Modelo"]) == {MODELOS[1]}
+    assert [list(d) for d in tabela["Dezenas"]] == linhas(bilhetes)
+    assert tabela["Pares"].tolist() == [sum(1 for n in d if n % 2 == 0) for d in linhas(bilhetes)]
+    assert tabela["Soma"].tolist() == [sum(d) for d in linhas(bilhetes)]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from benchmark import gerar_matriz
+from motor_matematico import AtributosDezenas, MatrizTransicao, MotorFractal
+
+TAMANHOS = (0, 1, 2, 7, 130)
+
+
+def estado_atributos(a):
+    return {"desempate": a.desempate, "sequencia": a.sequencia, "pares": a.pares, "atraso": a.atraso(),
+            **{f"freq_{w}": c for w, c in a.frequencias.items()}}
+
+
+def estado_transicao(t):
+    return {"T": t.T, "origens": t.origens}
+
+
+def estado_fractal(f):
+    h = f.expoentes()
+    return {"soma_rs": f.soma_rs, "n_rs": f.n_rs, "soma_f2": f.soma_f2, "n_f2": f.n_f2, "rs": h["rs"], "dfa": h["dfa"],
+            **{f"aberto_{j}": aberto for j, aberto in enumerate(f.abertos)}}
+
+
+ESTRUTURAS = {
+    "atributos": (lambda m, c: AtributosDezenas(m, c), estado_atributos),
+    "markov": (lambda m, c: MatrizTransicao(m, c), estado_transicao),
+    "markov_janela": (lambda m, c: MatrizTransicao(m, c, janela=20, decaimento=0.9), estado_transicao),
+    "fractal": (lambda m, c: MotorFractal(m, c), estado_fractal),
+}
+
+
+@pytest.mark.parametrize("jogo", ["QUINA", "LOTOMANIA"])
+@pytest.mark.parametrize("n", TAMANHOS)
+@pytest.mark.parametrize("estrutura", list(ESTRUTURAS))
+def test_avanco_incremental_igual_reconstrucao(estrutura, n, jogo):
+    """Anexar sorteio a sorteio, do mais antigo ao mais novo, dá o mesmo estado que montar do zero em cada cursor."""
+    montar, estado = ESTRUTURAS[estrutura]
+    matriz = gerar_matriz(jogo, n)
+    incremental = montar(matriz, n)
+    for cursor in range(n, -1, -1):
+        incremental.posicionar(cursor)
+        assert incremental.cursor == cursor
+        esperado = estado(montar(matriz, cursor))
+        obtido = estado(incremental)
+        assert esperado.keys() == obtido.keys()
+        for nome in esperado:
+            np.testing.assert_allclose(obtido[nome], esperado[nome], rtol=1e-9, atol=1e-9, err_msg=f"{nome} no cursor {cursor}")
+
+
+def test_historia_vazia():
+    matriz = gerar_matriz("MEGA_SENA", 0)
+    assert len(matriz.serie_frequencia()) == 0
+    atributos = AtributosDezenas(matriz)
+    assert not atributos.sequencia.any() and not atributos.atraso().any()
+    assert atributos.instantaneo()["cursor"] == 0
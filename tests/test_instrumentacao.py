@@ -0,0 +1,43 @@
+import threading
+
+from instrumentacao import INSTRUMENTACAO, Instrumentacao
+from motor_matematico import BacktestIncremental
+
+
+def test_execucao_mede_no_proprio_registro_e_soma_no_fim():
+    processo = Instrumentacao(ativo=True)
+    processo.contar("antes")
+    with processo.nova_execucao() as rodada:
+        processo.contar("dentro", 2)
+        processo.excecao("local", ValueError("x"))
+        assert processo.resumo()["contadores"] == {"antes": 1}
+    assert rodada.resumo()["contadores"] == {"dentro": 2}
+    resumo = processo.resumo()
+    assert resumo["contadores"] == {"antes": 1, "dentro": 2}
+    assert resumo["excecoes"]["local"]["quantidade"] == 1
+
+
+def test_sessoes_nao_zeram_uma_a_outra():
+    sessoes = {nome: Instrumentacao(ativo=True) for nome in ("a", "b")}
+    pronto = threading.Barrier(2)
+
+    def rodar(nome):
+        INSTRUMENTACAO.usar(sessoes[nome])
+        with INSTRUMENTACAO.span(f"render.{nome}"): INSTRUMENTACAO.contar("bilhetes.gerados", 3)
+        pronto.wait()
+        if nome == "a": sessoes[nome].reiniciar()
+
+    threads = [threading.Thread(target=rodar, args=(nome,)) for nome in sessoes]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert sessoes["a"].resumo()["spans"] == {}
+    assert list(sessoes["b"].resumo()["spans"]) == ["render.b"]
+    assert sessoes["b"].resumo()["contadores"] == {"bilhetes.gerados": 3}
+    assert "render.a" not in INSTRUMENTACAO.resumo()["spans"]
+
+
+def test_selecao_com_pool_pequeno_nao_registra_excecao():
+    with INSTRUMENTACAO.nova_execucao() as rodada:
+        escolhidos = BacktestIncremental.selecionar([1, 2, 3], [4, 5, 6, 7, 8], 6, [], [], 0)
+    assert escolhidos == [1, 2, 3, 4, 5, 6]
+    assert rodada.resumo()["excecoes"] == {}
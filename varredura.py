@@ -0,0 +1,256 @@
+"""
+FRACTALV - Varredura de Parâmetros (Gestão de Versão)
+Procura, por jogo, a melhor "versão" do motor: janelas de frequência/Markov/IA, escalas do
+Hurst, tamanho do pool e corte da elite. As configurações (grade ou sorteio aleatório) são
+avaliadas no backtest em processos paralelos, todos lendo a mesma história publicada uma
+única vez em memória compartilhada. Successive halving: todas começam com poucas dobras e só
+a melhor fração (1/eta) segue para um orçamento eta vezes maior, então as configurações
+claramente piores são descartadas cedo.
+
+A versão estável de cada jogo fica em resultados/versoes.json. A seleção usa só as dobras mais
+antigas; as `dobras_validacao` mais recentes ficam reservadas, e a campeã só é promovida se, com
+o modelo que a seleção escolheu, vencer a estável nessas dobras que ela nunca viu ("Nunca
+presuma, valide"). Comparar nas mesmas dobras da seleção promoveria ruído (maldição do
+vencedor). A estável nunca é descartada no meio.
+
+Uso:
+    python varredura.py --jogos MEGA_SENA --modo aleatoria --configuracoes 40
+    python varredura.py --modo grade --profundidade 96 --sem-ia --local
+"""
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+from links_planilhas import FORMATOS_JOGOS
+from motor_matematico import BacktestIncremental
+from executor_paralelo import publicar, tarefas_modelo, _tarefa
+from instrumentacao import INSTRUMENTACAO
+
+# Junto dos outros artefatos de execução (resultados/, fora do git)
+ARQUIVO_VERSOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados", "versoes.json")
+# Local anterior, lido enquanto a primeira varredura não grava no novo
+ARQUIVO_VERSOES_ANTIGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "versoes.json")
+
+ESPACO = {
+    "janela_freq": [30, 50, 80, 120],
+    "janela_markov": [50, 100, 200],
+    "decaimento_markov": [1.0, 0.98, 0.95],
+    "janela_ia": [3, 5, 8],
+    "escalas_fractal": [None, [8, 16, 32, 64], [4, 8, 16, 32], [4, 8, 16, 32, 64, 128]],
+    "fator_pool": [2, 3, 4],
+    "pool_minimo": [20, 40, 60],
+    "elite_extra": [5, 10, 20],
+}
+
+# --- CONFIGURAÇÕES ---
+def gerar_configuracoes(espaco=ESPACO, modo="aleatoria", quantidade=30, semente=0):
+    """Lista de dicionários de parâmetros: a grade completa (limitada a quantidade) ou um sorteio sem repetição."""
+    nomes = list(espaco)
+    if modo == "grade":
+        return [dict(zip(nomes, valores)) for valores in itertools.islice(itertools.product(*espaco.values()), quantidade)]
+    rng = np.random.default_rng(semente)
+    total = math.prod(len(v) for v in espaco.values())
+    vistas, configuracoes = set(), []
+    while len(configuracoes) < min(quantidade, total):
+        escolha = tuple(int(rng.integers(len(espaco[n]))) for n in nomes)
+        if escolha in vistas: continue
+        vistas.add(escolha)
+        configuracoes.append({n: espaco[n][i] for n, i in zip(nomes, escolha)})
+    return configuracoes
+
+def _chave(parametros):
+    return json.dumps({**BacktestIncremental.PARAMETROS, **parametros}, sort_keys=True)
+
+# --- VERSÕES ---
+def carregar_versoes(caminho=ARQUIVO_VERSOES):
+    if caminho == ARQUIVO_VERSOES and not os.path.exists(caminho) and os.path.exists(ARQUIVO_VERSOES_ANTIGO): caminho = ARQUIVO_VERSOES_ANTIGO
+    try:
+        with open(caminho, encoding="utf-8") as f: return json.load(f)
+    except FileNotFoundError: return {"jogos": {}}
+    except (OSError, ValueError) as e:
+        INSTRUMENTACAO.excecao("varredura.versoes", e)
+        return {"jogos": {}}
+
+def salvar_versoes(versoes, caminho=ARQUIVO_VERSOES):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f: json.dump(versoes, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+def parametros_estaveis(jogo, versoes=None):
+    """Parâmetros da versão estável do jogo ({} = padrões do motor)."""
+    versoes = versoes if versoes is not None else carregar_versoes()
+    return dict(((versoes.get("jogos", {}).get(jogo) or {}).get("estavel") or {}).get("parametros", {}))
+
+def registrar_resultado(versoes, jogo, resultado, impressao=None):
+    """
+    Acrescenta a rodada ao histórico do jogo e promove a campeã se ela superou a estável nas
+    dobras de validação (as que a seleção não usou).
+    """
+    registro = versoes.setdefault("jogos", {}).setdefault(jogo, {"estavel": None, "historico": []})
+    campea, estavel, validacao = resultado["campea"], resultado["estavel"], resultado["validacao"]
+    promovida = campea is not estavel and (estavel is None or (validacao["campea"] is not None and
+                                                                (validacao["estavel"] is None or validacao["campea"] > validacao["estavel"])))
+    rodada = {"gerado_em": datetime.now().isoformat(timespec="seconds"), "impressao": impressao,
+              "dobras": resultado["dobras"], "configuracoes": resultado["configuracoes"], "rodadas": resultado["rodadas"],
+              "campea": campea, "estavel_anterior": estavel, "validacao": validacao, "promovida": promovida, "placar": resultado["placar"][:10]}
+    registro["historico"].append(rodada)
+    if promovida:
+        versao = 1 + max([h.get("versao", 0) for h in registro["historico"]] + [0])
+        rodada["versao"] = versao
+        registro["estavel"] = {"versao": versao, "parametros": campea["parametros"], "modelo": campea["modelo"],
+                               "score": campea["score"], "dobras": resultado["dobras"], "validacao": validacao["campea"], "gerado_em": rodada["gerado_em"]}
+    return promovida
+
+# --- SUCCESSIVE HALVING ---
+class VarreduraParametros:
+    """
+    dobras_iniciais: orçamento da primeira rodada; a cada rodada sobrevivem ceil(n/eta)
+    configurações e o orçamento é multiplicado por eta, até a profundidade. Cada rodada só
+    avalia as dobras novas (mais antigas) e soma ao que já foi medido: o backtest de uma dobra
+    não depende das outras. dobras_validacao: dobras mais recentes fora da seleção, usadas só
+    para decidir a promoção.
+    """
+    def __init__(self, max_workers=None, eta=3, dobras_iniciais=6, profundidade=54, modelos=None, intervalo_ia=1, dobras_validacao=24):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.eta = max(2, eta)
+        self.dobras_iniciais = dobras_iniciais
+        self.profundidade = profundidade
+        self.modelos = list(modelos or BacktestIncremental.MODELOS)
+        self.intervalo_ia = intervalo_ia
+        self.dobras_validacao = dobras_validacao
+
+    @staticmethod
+    def pontuar(por_dobra):
+        """(score, modelo): o placar do melhor modelo, como no backtest do app."""
+        placar = {}
+        for acertos in por_dobra.values():
+            for nome, valor in acertos.items(): placar[nome] = placar.get(nome, 0) + valor
+        if not placar: return 0, None
+        melhor = max(placar, key=placar.get)
+        return placar[melhor], melhor
+
+    def _avaliar(self, pool, descritor, configuracoes, indices, dobras, acertos, progresso=None):
+        futuros = {}
+        for c in indices:
+            for nome in self.modelos:
+                for bloco in tarefas_modelo(nome, dobras, self.intervalo_ia):
+                    futuros[pool.submit(_tarefa, descritor, nome, bloco, self.intervalo_ia, configuracoes[c], INSTRUMENTACAO.medindo())] = c
+        for feitas, futuro in enumerate(as_completed(futuros), start=1):
+            c = futuros[futuro]
+            try:
+                por_dobra, medicoes = futuro.result()
+                INSTRUMENTACAO.mesclar(medicoes)
+                if acertos[c] is not None:
+                    for dobra, valores in por_dobra.items(): acertos[c].setdefault(dobra, {}).update(valores)
+            except Exception as e:
+                INSTRUMENTACAO.excecao("varredura.tarefa", e)
+                acertos[c] = None
+            if progresso: progresso(feitas, len(futuros))
+
+    def executar(self, jogo, matriz, configuracoes, estavel=None, pool=None, progresso=None):
+        """
+        configuracoes: lista de dicionários de parâmetros. estavel: parâmetros da versão atual
+        (entra na disputa e nunca é podada). Devolve campeã, estável, o placar final (nas dobras
+        da seleção) e os scores das duas nas dobras de validação.
+        """
+        validacao = self.dobras_validacao
+        profundidade = min(self.profundidade, len(matriz) - 50 - validacao)
+        if profundidade <= 0: raise ValueError(f"{jogo}: história curta demais para a varredura")
+        unicas = {}
+        for parametros in ([estavel if estavel is not None else {}] + list(configuracoes)): unicas.setdefault(_chave(parametros), parametros)
+        configuracoes = list(unicas.values())
+        # Índice 0 é a estável (ou os padrões, quando o jogo ainda não tem versão)
+        acertos = [dict() for _ in configuracoes]
+        vivos, feitas, alvo, rodadas = list(range(len(configuracoes))), 0, min(self.dobras_iniciais, profundidade), []
+        shm, descritor = publicar(jogo, matriz)
+        proprio = pool is None
+        try:
+            if proprio: pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context("spawn"))
+            with INSTRUMENTACAO.span("varredura"):
+                while True:
+                    self._avaliar(pool, descritor, configuracoes, vivos, range(validacao + feitas, validacao + alvo), acertos, progresso)
+                    feitas = alvo
+                    vivos = [c for c in vivos if acertos[c] is not None]
+                    scores = {c: self.pontuar(acertos[c])[0] for c in vivos}
+                    rodadas.append({"dobras": feitas, "avaliadas": len(vivos)})
+                    if feitas >= profundidade or len(vivos) <= 1: break
+                    ordem = sorted(vivos, key=lambda c: (-scores[c], c))
+                    vivos = ordem[:math.ceil(len(ordem) / self.eta)]
+                    if 0 in ordem and 0 not in vivos: vivos.append(0)
+                    alvo = min(profundidade, alvo * self.eta)
+                finalistas = [c for c in vivos if c != 0] or vivos
+                indice_campea = max(finalistas, key=lambda c: (self.pontuar(acertos[c])[0], -c))
+                # Campeã e estável nas dobras reservadas, cada uma com o modelo escolhido na seleção
+                reservadas = [dict() for _ in configuracoes]
+                if validacao: self._avaliar(pool, descritor, configuracoes, sorted({indice_campea, 0} & set(vivos)), range(validacao), reservadas)
+        finally:
+            if proprio and pool is not None: pool.shutdown()
+            shm.close()
+            shm.unlink()
+
+        def resumo(c):
+            score, modelo = self.pontuar(acertos[c])
+            return {"parametros": configuracoes[c], "modelo": modelo, "score": score, "media": score / max(feitas, 1)}
+        def validado(c, modelo):
+            # Sem dobras reservadas (dobras_validacao=0) a comparação volta a ser nas dobras da seleção
+            if not validacao: return resumo(c)["score"] if c in vivos else None
+            if c not in vivos or reservadas[c] is None or len(reservadas[c]) < validacao: return None
+            return sum(valores.get(modelo, 0) for valores in reservadas[c].values())
+        placar = sorted((resumo(c) for c in vivos), key=lambda r: -r["score"])
+        campea = resumo(indice_campea)
+        estavel_final = resumo(0) if 0 in vivos else None
+        if indice_campea == 0: campea = estavel_final
+        return {"campea": campea, "estavel": estavel_final, "placar": placar, "dobras": feitas,
+                "configuracoes": len(configuracoes), "rodadas": rodadas,
+                "validacao": {"dobras": validacao, "campea": validado(indice_campea, campea["modelo"]),
+                              "estavel": validado(0, estavel_final["modelo"]) if estavel_final else None}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros do FRACTALV (successive halving)")
+    parser.add_argument("--jogos", nargs="+", choices=list(FORMATOS_JOGOS))
+    parser.add_argument("--modo", default="aleatoria", choices=["aleatoria", "grade"])
+    parser.add_argument("--configuracoes", type=int, default=27)
+    parser.add_argument("--profundidade", type=int, default=54)
+    parser.add_argument("--dobras-iniciais", type=int, default=6)
+    parser.add_argument("--validacao", type=int, default=24, help="dobras mais recentes reservadas para decidir a promoção")
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--sem-ia", action="store_true", help="fora a IA (a floresta domina o custo)")
+    parser.add_argument("--local", action="store_true", help="usa só o cache local da ingestão, sem baixar")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default=ARQUIVO_VERSOES)
+    args = parser.parse_args(argv)
+
+    from ingestao import IngestorDados
+    jogos = args.jogos or list(FORMATOS_JOGOS)
+    ingestor = IngestorDados()
+    modelos = [n for n, t in BacktestIncremental.MODELOS.items() if not (args.sem_ia and t == "IA")]
+    varredura = VarreduraParametros(args.workers, args.eta, args.dobras_iniciais, args.profundidade, modelos, dobras_validacao=args.validacao)
+    versoes = carregar_versoes(args.saida)
+    with ProcessPoolExecutor(max_workers=varredura.max_workers, mp_context=mp.get_context("spawn")) as pool:
+        for jogo in jogos:
+            matriz = ingestor.carregar_local(jogo) if args.local else ingestor.carregar(jogo)
+            if matriz is None:
+                print(f"{jogo}: sem dados", file=sys.stderr)
+                continue
+            configuracoes = gerar_configuracoes(ESPACO, args.modo, args.configuracoes, args.semente)
+            registro = versoes.get("jogos", {}).get(jogo) or {}
+            estavel = (registro.get("estavel") or {}).get("parametros")
+            resultado = varredura.executar(jogo, matriz, configuracoes, estavel, pool)
+            promovida = registrar_resultado(versoes, jogo, resultado, matriz.impressao)
+            salvar_versoes(versoes, args.saida)
+            campea, anterior, validacao = resultado["campea"], resultado["estavel"], resultado["validacao"]
+            print(f"{jogo}: campeã {campea['score']} acertos em {resultado['dobras']} dobras ({campea['modelo']}); "
+                  f"validação em {validacao['dobras']} dobras: campeã {validacao['campea']} x estável {validacao['estavel']} "
+                  f"-> {'PROMOVIDA' if promovida else 'mantida'}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())